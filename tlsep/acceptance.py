@@ -1,9 +1,13 @@
 from z3 import *
 
+import dbm
 import era
 import event
 import expression
+import helper
+import stats
 import symbolicword
+import z3session
 
 def state_formula(q: era.State, nvars: int, pos: int,
                   state_vars: list) -> list:
@@ -114,74 +118,188 @@ def f_final_states(era: era.ERA, nvars: int, state_vars: list, pos: int):
     phi = []
     for each_state in era.states.keys():
         q = era.states[each_state]
-        if q.accepting:
+        if era.is_final(each_state):
             phi.append(state_formula(q, nvars, pos, state_vars))
     return Or(phi)
 
-def check(era: era.ERA, negword: symbolicword.SymWord):
+def z3_check(era: era.ERA, negword: symbolicword.SymWord):
+    ''' return True if era accepts a timed word of negword (decided using Z3)
+
+        the query is made in the session 'check' (see z3session.py):
+        the formula of a prefix of negword is kept in the solver for the
+        next query, so era must not be modified between two calls
+        (call z3session.session('check').reset() otherwise)
+    '''
     # quick check when negword is EPSILON
     if negword.is_epsilon:
-        return era.states[0].accepting
+        return era.is_final(0)
 
     nvars = len(bin(era.nstates)[2:]) # we are slicing the string to remove the '0b' that gets prefixed while converting an integer to binary
-    
-    phi = [] # formula to be constructed
+
+    session = z3session.session('check')
 
     # variables to denote states
-    state_vars = [[Bool(f'q{i}_{pos}') for i in range(nvars)]
-                                       for pos in range(negword.len+1)]
+    state_vars = [[session.bool(f'q{i}_{pos}') for i in range(nvars)]
+                                               for pos in range(negword.len+1)]
 
     # Real variables for denoting time stamps
-    time_vars = [Real(f't_{i}') for i in range(negword.len)]
-
-    # all variables in time_vars should be >= 0
-    phi.append(And([time_vars[i] >= 0 for i in range(len(time_vars))]))
-
-    # all variables in time_vars should be in increasing order
-    phi.append(And([time_vars[i] >= time_vars[i-1] for i in range(1,len(time_vars))]))
-
-    # formula for initial state
-    phi.append(state_formula(era.initialstate, nvars, 0, state_vars))
-
-    # formulae for transitions
-    for i in range(negword.len):
+    time_vars = [session.real(f't_{i}') for i in range(negword.len)]
+
+    def frame(k: int) -> list:
+        # frame 0 is the initial state, frame i+1 is the i-th event of negword
+        if k == 0:
+            return [state_formula(era.initialstate, nvars, 0, state_vars)]
+        i = k - 1
+        phi = [time_vars[i] >= 0 if i == 0 else time_vars[i] >= time_vars[i-1]]
         last_occurrence = find_last_occurrence(negword, negword[i].event, i)
         formulae = build_formula_for_event(era, negword[i].event, negword, state_vars, time_vars, i, last_occurrence)
         if formulae == []:  # there is no transition on event from state in the era
-            return False
+            phi.append(BoolVal(False))
         else: # formulae != []
             phi.append(Or(formulae))
-    
-    # formula for accepting states
-    phi.append(f_final_states(era, nvars, state_vars, negword.len))
+        # formula for word
+        phi += build_guard(negword[i].guard, i, negword, time_vars)
+        return phi
 
-    # formula for word
-    phi.append(And(f_word(negword, time_vars)))
+    keys = [era] + [negword[i].id for i in range(negword.len)]
 
-    s = Solver()
-    s.add(phi)
+    # formula for accepting states
+    return session.is_sat(keys, frame, [f_final_states(era, nvars, state_vars, negword.len)])
 
-    if str(s.check()) == 'sat':
-        return True
-    return False
+# which procedure decides emptiness of symbolic words:
+#   'dbm'   : reading the word in a DBM (see dbm.py)
+#   'z3'    : one Z3 query per word
+#   'check' : both, and raise an AssertionError if they disagree
+emptiness_backend = 'dbm'
 
-def is_empty(w: symbolicword.SymWord) -> bool:
+def clocks_of_word(w: symbolicword.SymWord) -> list:
+    '''return the names of the clocks that are reset or read in w
+    '''
+    clocks = dict()
+    for symbolic_event in w:
+        clocks[symbolic_event.event.name] = None
+        for each_conjunct in symbolic_event.guard.conjuncts():
+            if each_conjunct.type != 'True':
+                clocks[each_conjunct.get_event().name] = None
+    clocks.pop('EPSILON', None)
+    return list(clocks)
+
+def extend_zone(zone: dbm.DBM, w: symbolicword.SymWord) -> dbm.DBM:
+    '''return the zone reached after reading w from zone
+       (stops reading as soon as the zone becomes empty)
+    '''
+    for symbolic_event in w:
+        if zone.is_empty():
+            break
+        zone = zone.step(symbolic_event.event.name, symbolic_event.guard)
+    return zone
+
+def zone_of_word(w: symbolicword.SymWord, clocks: list = None) -> dbm.DBM:
+    '''return the zone reached after reading w from the initial zone
+    '''
+    if clocks is None:
+        clocks = clocks_of_word(w)
+    return extend_zone(dbm.DBM.initial(clocks), w)
+
+def z3_is_empty(w: symbolicword.SymWord) -> bool:
     '''check if an expression is empty
+       (decided using Z3, in the session 'emptiness' of z3session.py)
     '''
-    # Real variables for denoting time stamps
-    time_vars = [Real(f't_{i}') for i in range(w.len)]
+    session = z3session.session('emptiness')
 
-    phi = []
+    # Real variables for denoting time stamps
+    time_vars = [session.real(f't_{i}') for i in range(w.len)]
 
-    # all variables in time_vars should be >= 0
-    phi.append(And([time_vars[i] >= 0 for i in range(len(time_vars))]))
+    def frame(i: int) -> list:
+        # all variables in time_vars should be >= 0 and in increasing order
+        phi = [time_vars[i] >= 0 if i == 0 else time_vars[i] >= time_vars[i-1]]
+        # formula for the i-th event of the word
+        phi += build_guard(w[i].guard, i, w, time_vars)
+        return phi
 
-    # all variables in time_vars should be in increasing order
-    phi.append(And([time_vars[i] >= time_vars[i-1] for i in range(1,len(time_vars))]))
+    return not session.is_sat([w[i].id for i in range(w.len)], frame)
 
-    # formula for word
-    phi.append(And(f_word(w, time_vars)))
+def is_empty(w: symbolicword.SymWord) -> bool:
+    '''check if an expression is empty
+    '''
+    if emptiness_backend == 'dbm':
+        return zone_of_word(w).is_empty()
+    elif emptiness_backend == 'z3':
+        return z3_is_empty(w)
+    elif emptiness_backend == 'check':
+        ans = zone_of_word(w).is_empty()
+        assert ans == z3_is_empty(w), f'acceptance.py: is_empty disagrees with Z3 on {w}'
+        return ans
+    else:
+        raise ValueError(f'acceptance.py: unknown emptiness backend {emptiness_backend}')
+
+# which procedure decides if an ERA accepts a timed word of a symbolic word:
+#   'simulation' : reading the word in the ERA (see simulate),
+#                  with Z3 for the words that cannot be simulated
+#   'z3'         : one Z3 query per word
+#   'check'      : both, and raise an AssertionError if they disagree
+acceptance_backend = 'simulation'
+
+def simulate(era: era.ERA, w: symbolicword.SymWord):
+    ''' read w in era letter by letter, following every transition
+        whose guard contains the guard of the letter (subset construction,
+        so that era may be nondeterministic)
+
+        returns:
+            True  : if era accepts a timed word of w
+            False : otherwise
+            None  : if the guard of a letter of w intersects the guard
+                    of a transition without being contained in it
+                    (e.g. w is not a region word, or its regions are
+                    coarser than the guards of era)
+    '''
+    if is_empty(w):
+        return False
+
+    # when every guard of w is contained in or disjoint from the guards
+    # of the transitions it meets, all the timed words of w have the same runs
+    current = {era.initialstate.index()}
+    for symbolic_event in w:
+        successors = set()
+        for q in current:
+            for t in era.transitions.on_event(q, symbolic_event.event.name):
+                if t.src.status == False or t.tgt.status == False:
+                    continue
+                if helper.is_contained(symbolic_event.guard, t.guard):
+                    successors.add(t.tgt.index())
+                elif helper.intersects(symbolic_event.guard, t.guard):
+                    return None
+        if not successors:
+            return False
+        current = successors
+    return any(era.is_final(q) for q in current)
 
-    s = Solver()
-    s.append(phi)
-    return (str(s.check()) == 'unsat')
+def check(era: era.ERA, negword: symbolicword.SymWord, 
+          metrics: stats.LearnerMetrics = None) -> bool:
+    ''' return True if era accepts a timed word of negword
+        (the time of the call is recorded as 'acceptance' in metrics)
+    '''
+    # quick check when negword is EPSILON
+    if negword.is_epsilon:
+        return era.is_final(0)
+
+    metrics = metrics or stats.metrics
+    with metrics.timed('acceptance'):
+        if acceptance_backend == 'simulation':
+            ans = simulate(era, negword)
+            if ans is not None:
+                return ans
+            metrics.count('acceptance_z3')
+            return z3_check(era, negword)
+        elif acceptance_backend == 'z3':
+            metrics.count('acceptance_z3')
+            return z3_check(era, negword)
+        elif acceptance_backend == 'check':
+            ans = simulate(era, negword)
+            metrics.count('acceptance_z3')
+            if ans is None:
+                return z3_check(era, negword)
+            assert ans == z3_check(era, negword), f'acceptance.py: check disagrees with Z3 on {negword}'
+            return ans
+        else:
+            raise ValueError(f'acceptance.py: unknown acceptance backend {acceptance_backend}')
@@ -0,0 +1,272 @@
+''' this file implements a benchmark of tLsep over directories of automata
+
+    every automaton (a .txt file in the syntax of file-format.md) is learnt
+    for every given value of m, several times, each run in a fresh process
+    so that the runs do not share caches and the peak memory of a run is
+    its own. a run records its wall time, the counters and the timers
+    of its stats.LearnerMetrics (the total time of a timer is called a phase),
+    the number of states of the learnt automaton and the peak resident memory.
+
+    the results are written to a JSON file, which can be compared
+    with a baseline written by a previous benchmark:
+
+        python3 benchmark.py --out new.json --baseline old.json
+        python3 benchmark.py --compare old.json new.json
+'''
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+import acceptance
+import helper
+import parse
+import stats
+import tLsep
+import zonegraph
+
+# the counters recorded for every run
+COUNTERS = stats.COUNTERS
+
+def default_m(path: str) -> int:
+    ''' return the largest constant appearing in the guards of the automaton in path
+    '''
+    return max(zonegraph.max_constants([parse.build_era_from_file(path)]).values(), default=0)
+
+def peak_rss_kb() -> int:
+    ''' return the peak resident memory of the current process, in kilobytes
+    '''
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss     # bytes on MacOS
+
+def learn(path: str, m: int, options: dict) -> dict:
+    ''' learn the automaton in path with tLsep and return the measures of the run
+    '''
+    helper.guard_backend = options['guards']
+    acceptance.emptiness_backend = options['word_emptiness']
+    tLsep.compatible_sets_limit = options['max_compatible_sets']
+    if options['inclusion'] == 'zonegraph':
+        oracle = tLsep.make_oracle(options['inclusion'], options['cache_inclusion'])
+    else:
+        oracle = tLsep.make_oracle(options['inclusion'], options['cache_inclusion'],
+                                   tchecker=options['tchecker'])
+    metrics = stats.LearnerMetrics()
+
+    sul = parse.build_era_from_file(path)
+    start = time.perf_counter()
+    automaton = tLsep.run_tLsep(sul, m, oracle, metrics)
+    wall = time.perf_counter() - start
+
+    result = {'status': 'ok', 'wall': wall, 'states': automaton.states_count(),
+              'phases': {name: timer.total for name, timer in metrics.timers.items()},
+              'metrics': metrics.snapshot()}
+    result.update({counter: metrics[counter] for counter in COUNTERS})
+    result['peak_rss_kb'] = peak_rss_kb()
+    return result
+
+def _child(conn, path: str, m: int, options: dict) -> None:
+    try:
+        result = learn(path, m, options)
+    except Exception as e:
+        result = {'status': 'error', 'error': f'{type(e).__name__}: {e}'}
+    conn.send(result)
+    conn.close()
+
+def run_in_process(path: str, m: int, options: dict, timeout: float = None) -> dict:
+    ''' same as learn, but in a new process, killed after timeout seconds
+    '''
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_child, args=(sender, path, m, options))
+    process.start()
+    sender.close()
+    if receiver.poll(timeout):
+        try:
+            result = receiver.recv()
+        except EOFError:    # the process died without an answer
+            result = {'status': 'error', 'error': 'no result'}
+    else:
+        result = {'status': 'timeout', 'wall': timeout}
+        process.terminate()
+    process.join()
+    if result['status'] == 'error' and process.exitcode:
+        result['error'] += f' (exit code {process.exitcode})'
+    return result
+
+def find_automata(paths: list) -> list:
+    ''' return the .txt files in paths (files, or directories that are not searched recursively)
+    '''
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith('.txt'))
+        else:
+            files.append(path)
+    return files
+
+def load_manifests(files: list) -> dict:
+    ''' return the parameters of the files written by generator.py,
+        as a dict {path: parameters}, from the manifests of their directories
+    '''
+    parameters = {}
+    for directory in {os.path.dirname(path) for path in files}:
+        manifest = os.path.join(directory, 'manifest.json')
+        if os.path.exists(manifest):
+            with open(manifest) as f:
+                for entry in json.load(f):
+                    parameters[os.path.join(directory, entry['file'])] = entry
+    return parameters
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def summarize(runs: list) -> dict:
+    ''' return the summary of the repetitions of one benchmark:
+        the median and the minimum of the times and the memory,
+        and the counters and states of the first successful run
+        (tLsep is deterministic, so they are the same in every run)
+    '''
+    ok = [run for run in runs if run['status'] == 'ok']
+    if not ok:
+        return {'status': runs[0]['status']}
+    summary = {'status': 'ok',
+               'wall': statistics.median(run['wall'] for run in ok),
+               'wall_min': min(run['wall'] for run in ok),
+               'peak_rss_kb': int(statistics.median(run['peak_rss_kb'] for run in ok)),
+               'phases': {phase: statistics.median(run['phases'].get(phase, 0) for run in ok)
+                          for phase in ok[0]['phases']},
+               'states': ok[0]['states']}
+    summary.update({counter: ok[0][counter] for counter in COUNTERS})
+    return summary
+
+def benchmark(files: list, ms: list, repeat: int, options: dict, timeout: float = None) -> dict:
+    ''' run the benchmark, and return its results as a JSON-compatible dict
+        (the key of a benchmark is '<file>:<m>')
+    '''
+    results = {'meta': {'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                        'revision': git_revision(),
+                        'python': platform.python_version(),
+                        'platform': platform.platform(),
+                        'repeat': repeat, 'options': options},
+               'benchmarks': {}}
+    parameters = load_manifests(files)
+    for path in files:
+        for m in (ms or [default_m(path)]):
+            key = f'{os.path.basename(path)}:{m}'
+            runs = []
+            for i in range(repeat):
+                runs.append(run_in_process(path, m, options, timeout))
+                if runs[-1]['status'] != 'ok':   # repeating a failure or a timeout is useless
+                    break
+            summary = summarize(runs)
+            results['benchmarks'][key] = {'file': path, 'm': m, 'runs': runs, 'summary': summary}
+            if path in parameters:
+                results['benchmarks'][key]['parameters'] = parameters[path]
+            if summary['status'] == 'ok':
+                print(f'{key}: {summary["wall"]:.3f}s, {summary["states"]} states, '
+                      f'{summary["MQ"]} MQ, {summary["IQ"]} IQ, {summary["peak_rss_kb"]} KB', flush=True)
+            else:
+                print(f'{key}: {summary["status"]}', flush=True)
+    return results
+
+def compare(baseline: dict, results: dict, tolerance: float = 0.2, min_delta: float = 0.05) -> list:
+    ''' compare results with baseline, and return the list of regressions:
+            - a benchmark that succeeded in baseline and not in results,
+            - a median wall time (or phase time) larger than in baseline by more than
+              the fraction tolerance and by more than min_delta seconds,
+            - a larger query counter, or a different number of states,
+            - a peak memory larger than in baseline by more than the fraction tolerance
+    '''
+    regressions = []
+    for key, old in baseline['benchmarks'].items():
+        new = results['benchmarks'].get(key)
+        if new is None:
+            continue
+        old, new = old['summary'], new['summary']
+        if old['status'] != 'ok':
+            continue
+        if new['status'] != 'ok':
+            regressions.append(f'{key}: {new["status"]} (was ok)')
+            continue
+
+        def slower(name: str, t_old: float, t_new: float) -> None:
+            if t_new > t_old * (1 + tolerance) and t_new - t_old > min_delta:
+                regressions.append(f'{key}: {name} {t_old:.3f}s -> {t_new:.3f}s')
+
+        slower('wall time', old['wall'], new['wall'])
+        for phase, t_old in old['phases'].items():
+            slower(f'phase {phase}', t_old, new['phases'].get(phase, 0))
+        for counter in COUNTERS:
+            if counter in old and new.get(counter, 0) > old[counter]:
+                regressions.append(f'{key}: {counter} {old[counter]} -> {new[counter]}')
+        if new['states'] != old['states']:
+            regressions.append(f'{key}: states {old["states"]} -> {new["states"]}')
+        if new['peak_rss_kb'] > old['peak_rss_kb'] * (1 + tolerance):
+            regressions.append(f'{key}: peak memory {old["peak_rss_kb"]} KB -> {new["peak_rss_kb"]} KB')
+    return regressions
+
+def report_regressions(baseline_file: str, results: dict, tolerance: float) -> int:
+    with open(baseline_file) as f:
+        baseline = json.load(f)
+    regressions = compare(baseline, results, tolerance)
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    print(f'{len(regressions)} regression(s) with respect to {baseline_file}')
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    here = os.path.dirname(os.path.abspath(__file__))
+    argparser = argparse.ArgumentParser(description="benchmark tLsep on a set of automata")
+    argparser.add_argument('paths', nargs='*', default=[os.path.join(here, '..', 'examples')],
+                                    help="automata files, or directories of automata files (default: examples)")
+    argparser.add_argument('--m', dest='ms', type=int, nargs='+', default=None,
+                                  help="values of m (default: the largest constant of every automaton)", metavar="<int>")
+    argparser.add_argument('--repeat', dest='repeat', type=int, default=3,
+                                       help="number of runs of every benchmark", metavar="<int>")
+    argparser.add_argument('--timeout', dest='timeout', type=float, default=None,
+                                        help="time limit of a run, in seconds", metavar="<float>")
+    argparser.add_argument('--out', dest='out', type=str, default='benchmark.json',
+                                    help="file where the results are written", metavar="<str>")
+    argparser.add_argument('--baseline', dest='baseline', type=str, default=None,
+                                         help="results of a previous benchmark to compare with", metavar="<str>")
+    argparser.add_argument('--compare', dest='compare', type=str, nargs=2, default=None,
+                                        help="only compare two result files (baseline, then new)", metavar="<str>")
+    argparser.add_argument('--tolerance', dest='tolerance', type=float, default=0.2,
+                                          help="relative slowdown (or memory increase) flagged as a regression",
+                                          metavar="<float>")
+    argparser.add_argument('--guards', dest='guards', type=str,
+                                       choices=['native', 'z3', 'check'], default='native')
+    argparser.add_argument('--word-emptiness', dest='word_emptiness', type=str,
+                                               choices=['dbm', 'z3', 'check'], default='dbm')
+    argparser.add_argument('--inclusion', dest='inclusion', type=str,
+                                          choices=list(tLsep.oracles.keys()), default='tchecker')
+    argparser.add_argument('--cache-inclusion', dest='cache_inclusion', action='store_true')
+    argparser.add_argument('--tchecker', dest='tchecker', type=str, default=None, metavar="<str>")
+    argparser.add_argument('--max-compatible-sets', dest='max_compatible_sets', type=int, default=None, metavar="<int>")
+    args = argparser.parse_args()
+
+    if args.compare:
+        with open(args.compare[1]) as f:
+            sys.exit(report_regressions(args.compare[0], json.load(f), args.tolerance))
+
+    options = {'guards': args.guards, 'word_emptiness': args.word_emptiness,
+               'inclusion': args.inclusion, 'cache_inclusion': args.cache_inclusion,
+               'tchecker': args.tchecker, 'max_compatible_sets': args.max_compatible_sets}
+    results = benchmark(find_automata(args.paths), args.ms, args.repeat, options, args.timeout)
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=1)
+    print(f'results written to {args.out}')
+
+    if args.baseline:
+        sys.exit(report_regressions(args.baseline, results, args.tolerance))
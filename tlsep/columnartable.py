@@ -0,0 +1,108 @@
+''' this file implements the storage of the entries of an observation table
+
+    entries are stored column-wise in one int8 matrix, one row per
+    word of S and S.A, one column per suffix in E, with the encoding
+        1 -> 1, 0 -> 0, '?' -> -1
+    rows and columns are appended in amortized constant time
+    (the matrix doubles its capacity when it is full), and two rows are
+    compared through their signatures (the bytes of the row).
+'''
+
+import numpy as np
+
+# encoding of the entries of the table
+DONT_CARE = -1
+ENCODE = {0: 0, 1: 1, '?': DONT_CARE}
+DECODE = {0: 0, 1: 1, DONT_CARE: '?'}
+
+class ColumnarTable:
+    ''' a table of 0/1/? entries indexed by symbolic words (rows)
+        and by column numbers
+
+    attributes --
+    words  : list of the words of the rows, words[i] is the word of row i
+    index  : dict {word: row number}
+    data   : int8 matrix, data[:nrows, :ncols] holds the entries
+    nrows  : number of rows
+    ncols  : number of columns
+    '''
+    def __init__(self, ncols: int = 0) -> None:
+        self.words = []
+        self.index = {}
+        self.data = np.zeros((16, max(ncols, 4)), dtype=np.int8)
+        self.nrows = 0
+        self.ncols = ncols
+        self._signatures = {}   # row number -> signature, valid for the current ncols
+
+    def __len__(self) -> int:
+        return self.nrows
+
+    def __contains__(self, word) -> bool:
+        return word in self.index
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def keys(self):
+        return self.index.keys()
+
+    def __getitem__(self, word) -> tuple:
+        ''' return the row of word as a tuple of 0, 1 and '?'
+        '''
+        return self.row(self.index[word])
+
+    def row(self, row: int) -> tuple:
+        ''' same as __getitem__, but given the row number
+        '''
+        return tuple(DECODE[v] for v in self.data[row, :self.ncols].tolist())
+
+    def row_of(self, word) -> int:
+        return self.index[word]
+
+    def entry(self, row: int, col: int):
+        return DECODE[int(self.data[row, col])]
+
+    def add_row(self, word, values: list) -> int:
+        ''' add a row for word with the given entries (one per column)
+            and return its row number
+        '''
+        assert word not in self.index
+        assert len(values) == self.ncols
+        if self.nrows == self.data.shape[0]:
+            self._grow(2 * self.data.shape[0], self.data.shape[1])
+        row = self.nrows
+        self.data[row, :self.ncols] = [ENCODE[v] for v in values]
+        self.words.append(word)
+        self.index[word] = row
+        self.nrows += 1
+        return row
+
+    def add_column(self, values: list) -> None:
+        ''' add a column with the given entries (one per row, in the order of the rows)
+        '''
+        assert len(values) == self.nrows
+        if self.ncols == self.data.shape[1]:
+            self._grow(self.data.shape[0], 2 * self.data.shape[1])
+        self.data[:self.nrows, self.ncols] = [ENCODE[v] for v in values]
+        self.ncols += 1
+        self._signatures = {}
+
+    def _grow(self, nrows: int, ncols: int) -> None:
+        data = np.zeros((nrows, ncols), dtype=np.int8)
+        data[:self.nrows, :self.ncols] = self.data[:self.nrows, :self.ncols]
+        self.data = data
+
+    def signature(self, row: int) -> bytes:
+        ''' return the signature of a row: two rows have the same
+            signature iff they have the same entries
+        '''
+        sig = self._signatures.get(row)
+        if sig is None:
+            sig = self.data[row, :self.ncols].tobytes()
+            self._signatures[row] = sig
+        return sig
+
+    def rows(self, rows) -> np.ndarray:
+        ''' return the entries of the given rows (an array of row numbers)
+        '''
+        return self.data[rows, :self.ncols]
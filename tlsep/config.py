@@ -4,5 +4,5 @@ tchecker_path = ''
 # an example path is the following
 # tchecker_path = '/tools/tchecker/install/bin/tck-reach'
 
-# tchecker_path should not be left empty
-assert tchecker_path != ''
\ No newline at end of file
+# tchecker_path should not be left empty, unless inclusion queries
+# are answered without TChecker (tLsep.py --inclusion zonegraph)
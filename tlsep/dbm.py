@@ -0,0 +1,232 @@
+''' this file implements difference bound matrices (DBMs) over event-clocks
+
+    a DBM over the clocks x_1, ..., x_n is an (n+1) x (n+1) matrix M,
+    where M[i][j] is an upper bound on x_i - x_j (x_0 is the constant 0).
+    every bound is encoded as one integer, (c << 1) | 1 for '<= c' and
+    (c << 1) for '< c', so that bounds are compared with the usual < on integers.
+
+    reading a symbolic event (a, g) from a zone Z corresponds to
+    letting time elapse, intersecting with g and resetting the clock of a,
+    and a symbolic word is empty iff the zone reached after reading it is empty
+'''
+
+import guards
+import expression
+
+INF = float('inf')  # no bound
+LE_ZERO = 1         # the bound '<= 0'
+LT_ZERO = 0         # the bound '< 0'
+
+def bound(c: int, strict: bool) -> int:
+    ''' encode the bound '< c' (if strict) or '<= c' (otherwise)
+    '''
+    return (c << 1) if strict else ((c << 1) | 1)
+
+def add(b1, b2):
+    ''' return the sum of two encoded bounds
+    '''
+    if b1 == INF or b2 == INF:
+        return INF
+    return ((b1 & ~1) + (b2 & ~1)) | (b1 & b2 & 1)
+
+def constant(b: int) -> int:
+    return b >> 1
+
+def is_strict(b: int) -> bool:
+    return not (b & 1)
+
+class DBM:
+    ''' a canonical DBM over a fixed list of clocks
+
+    attributes --
+    clocks : tuple of names of the clocks, clocks[i-1] is x_i
+    index  : dict {name of a clock: position of the clock in the matrix}
+    matrix : list of rows, matrix[i][j] is an encoded bound on x_i - x_j
+    empty  : True if the DBM represents the empty set
+
+    clocks and index are shared among all the DBMs derived from one another
+    '''
+    __slots__ = ('clocks', 'index', 'matrix', 'empty')
+
+    def __init__(self, clocks: tuple, index: dict, matrix: list, empty: bool = False) -> None:
+        self.clocks = clocks
+        self.index = index
+        self.matrix = matrix
+        self.empty = empty
+
+    @classmethod
+    def initial(cls, clocks: list):
+        ''' the DBM in which every clock is 0
+        '''
+        clocks = tuple(clocks)
+        index = {clk: i+1 for i, clk in enumerate(clocks)}
+        n = len(clocks) + 1
+        return cls(clocks, index, [[LE_ZERO] * n for i in range(n)])
+
+    def copy(self):
+        return DBM(self.clocks, self.index, [row[:] for row in self.matrix], self.empty)
+
+    def __str__(self) -> str:
+        if self.empty:
+            return 'empty'
+        names = ['0'] + list(self.clocks)
+        constraints = []
+        for i, row in enumerate(self.matrix):
+            for j, b in enumerate(row):
+                if i == j or b == INF:
+                    continue
+                op = '<' if is_strict(b) else '<='
+                constraints.append(f'{names[i]}-{names[j]}{op}{constant(b)}')
+        return ' && '.join(constraints)
+
+    def is_empty(self) -> bool:
+        return self.empty
+
+    def elapse(self) -> None:
+        ''' let an arbitrary amount of time elapse (in-place)
+        '''
+        if self.empty:
+            return
+        for i in range(1, len(self.matrix)):
+            self.matrix[i][0] = INF
+
+    def constrain(self, i: int, j: int, b) -> None:
+        ''' intersect with the constraint x_i - x_j ~ b (in-place)
+            and restore the canonical form
+        '''
+        if self.empty:
+            return
+        M = self.matrix
+        if b >= M[i][j]:
+            return
+        if add(b, M[j][i]) < LE_ZERO:
+            self.empty = True
+            return
+        M[i][j] = b
+        n = len(M)
+        for k in range(n):
+            b_ki = add(M[k][i], b)
+            if b_ki == INF:
+                continue
+            row_k = M[k]
+            row_j = M[j]
+            for l in range(n):
+                b_kl = add(b_ki, row_j[l])
+                if b_kl < row_k[l]:
+                    row_k[l] = b_kl
+
+    def constrain_guard(self, g: expression.Expression) -> None:
+        ''' intersect with the set of valuations satisfying g (in-place)
+        '''
+        for clk, interval in guards.canonicalize(g).items():
+            self.constrain_interval(clk, interval)
+            if self.empty:
+                return
+
+    def constrain_interval(self, clk: str, interval: guards.Interval) -> None:
+        ''' intersect with the set of valuations where clk is in interval (in-place)
+        '''
+        if interval.is_empty():
+            self.empty = True
+            return
+        try:
+            x = self.index[clk]
+        except KeyError:
+            raise ValueError(f'dbm.py: unexpected clock {clk} in guard')
+        # x >= lower, that is, 0 - x <= -lower
+        self.constrain(0, x, bound(-interval.lower, interval.lower_strict))
+        # x <= upper
+        if interval.upper is not None:
+            self.constrain(x, 0, bound(interval.upper, interval.upper_strict))
+
+    def close(self) -> None:
+        ''' restore the canonical form after bounds were changed
+            directly in the matrix (in-place)
+        '''
+        if self.empty:
+            return
+        M = self.matrix
+        n = len(M)
+        for k in range(n):
+            row_k = M[k]
+            for i in range(n):
+                b_ik = M[i][k]
+                if b_ik == INF:
+                    continue
+                row_i = M[i]
+                for j in range(n):
+                    b_ij = add(b_ik, row_k[j])
+                    if b_ij < row_i[j]:
+                        row_i[j] = b_ij
+        if any(M[i][i] < LE_ZERO for i in range(n)):
+            self.empty = True
+
+    def extrapolate(self, max_constants: dict) -> None:
+        ''' apply the extrapolation ExtraM (in-place), where max_constants 
+            maps a clock to the largest constant it is compared with
+            (clocks that are not in max_constants are never compared)
+
+            the extrapolated zones of an ERA are finitely many, and a location
+            is reachable with a zone iff it is reachable with its extrapolation
+        '''
+        if self.empty:
+            return
+        M = self.matrix
+        n = len(M)
+        bounds = [0] + [max_constants.get(clk, 0) for clk in self.clocks]
+        changed = False
+        for i in range(n):
+            row_i = M[i]
+            for j in range(n):
+                if i == j:
+                    continue
+                if i != 0 and row_i[j] != INF and row_i[j] > bound(bounds[i], False):
+                    # x_i - x_j <= c for c > M(x_i): forget the bound
+                    row_i[j] = INF
+                    changed = True
+                elif j != 0 and row_i[j] < bound(-bounds[j], True):
+                    # x_i - x_j < -c for c > M(x_j): weaken to < -M(x_j)
+                    row_i[j] = bound(-bounds[j], True)
+                    changed = True
+        if changed:
+            self.close()
+
+    def includes(self, other: 'DBM') -> bool:
+        ''' return True  if other is a subset of self
+                   False otherwise
+            (both DBMs must be over the same clocks)
+        '''
+        if other.empty:
+            return True
+        if self.empty:
+            return False
+        for row_self, row_other in zip(self.matrix, other.matrix):
+            for b_self, b_other in zip(row_self, row_other):
+                if b_other > b_self:
+                    return False
+        return True
+
+    def reset(self, clk: str) -> None:
+        ''' set the clock clk to 0 (in-place)
+        '''
+        if self.empty:
+            return
+        x = self.index.get(clk)
+        if x is None:   # the clock of clk is never read
+            return
+        M = self.matrix
+        M[x] = M[0][:]
+        for row in M:
+            row[x] = row[0]
+        M[x][x] = LE_ZERO
+
+    def step(self, a: str, g: expression.Expression):
+        ''' return the DBM reached after reading the symbolic event (a, g)
+        '''
+        zone = self.copy()
+        if a == 'EPSILON':
+            return zone
+        zone.elapse()
+        zone.constrain_guard(g)
+        zone.reset(a)
+        return zone
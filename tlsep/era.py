@@ -1,11 +1,19 @@
 from copy import deepcopy
-import itertools
 
 import event
 import expression
+import guards
 from helper import is_contained, intersects
 import symbolicword
 
+def bits(b: int):
+    ''' iterate over the positions of the bits set in b, in increasing order
+    '''
+    while b:
+        low = b & -b
+        yield low.bit_length() - 1
+        b ^= low
+
 class State:
     ''' 
     class for defining states of an automaton
@@ -72,6 +80,111 @@ class Transition:
     def __str__(self):
         return f'{self.src.name}:{self.tgt.name}:{self.event}:{self.guard}'
 
+NO_TRANSITIONS = ()  # the (empty) transitions between two states that are not connected
+
+class TransitionRow:
+    ''' a read-only view of the transitions out of one state,
+        row[tgt] is the list of transitions to the state with index tgt
+    '''
+    __slots__ = ('targets', )
+
+    def __init__(self, targets: dict) -> None:
+        self.targets = targets
+
+    def __getitem__(self, tgt: int):
+        return self.targets.get(tgt, NO_TRANSITIONS)
+
+    def __iter__(self):
+        # only the non-empty lists of transitions, by increasing target
+        for tgt in sorted(self.targets):
+            yield self.targets[tgt]
+
+class Transitions:
+    ''' the transitions of an ERA, stored sparsely
+
+        transitions[src][tgt] is the list of transitions from src to tgt
+        (indices of states), as in a dense nstates x nstates matrix, but
+        only the non-empty lists are stored
+
+        attributes --
+        out      : dict {src: {tgt: [transitions from src to tgt]}}
+        by_event : dict {src: {name of event: [transitions from src on the event]}}
+    '''
+    def __init__(self) -> None:
+        self.out = {}
+        self.by_event = {}
+
+    def __getitem__(self, src: int) -> TransitionRow:
+        return TransitionRow(self.out.get(src, {}))
+
+    def __len__(self) -> int:
+        return sum(len(transitions) for targets in self.out.values() 
+                                    for transitions in targets.values())
+
+    def add(self, t: Transition) -> None:
+        src = t.src.index()
+        self.out.setdefault(src, {}).setdefault(t.tgt.index(), []).append(t)
+        self.by_event.setdefault(src, {}).setdefault(t.event.name, []).append(t)
+
+    def remove(self, t: Transition) -> None:
+        src = t.src.index()
+        tgt = t.tgt.index()
+        self.out[src][tgt].remove(t)
+        if len(self.out[src][tgt]) == 0:
+            del self.out[src][tgt]
+        self.by_event[src][t.event.name].remove(t)
+        if len(self.by_event[src][t.event.name]) == 0:
+            del self.by_event[src][t.event.name]
+
+    def clear_from(self, src: int) -> None:
+        ''' remove every transition out of src
+        '''
+        self.out.pop(src, None)
+        self.by_event.pop(src, None)
+
+    def from_state(self, src: int):
+        ''' iterate over the transitions out of src, by increasing target
+        '''
+        targets = self.out.get(src)
+        if targets is None:
+            return
+        for tgt in sorted(targets):
+            yield from targets[tgt]
+
+    def on_event(self, src: int, event_name: str):
+        ''' return the transitions out of src on the given event
+        '''
+        return self.by_event.get(src, {}).get(event_name, NO_TRANSITIONS)
+
+    def targets(self, src: int):
+        ''' return the indices of the states reachable from src in one transition
+        '''
+        return self.out.get(src, {}).keys()
+
+UNKNOWN = -2        # successor not computed yet
+NO_SUCCESSOR = -1   # the letter cannot be read from the state
+
+class LetterTable:
+    ''' a dense table of successors of the states of an ERA 
+        on a fixed list of symbolic letters (typically, the regions
+        used by the observation table)
+
+        successor[q * nletters + k] is the index of the state reached
+        from q on letters[k], NO_SUCCESSOR if letters[k] cannot be read from q,
+        or UNKNOWN if the entry has not been computed yet
+    '''
+    def __init__(self, nstates: int, letters: list) -> None:
+        self.letters = letters
+        self.nletters = len(letters)
+        # letters may index themselves (see observationTable.RegionAlphabet),
+        # and resolve the index of the letters that are not indexed yet
+        if hasattr(letters, 'letter_index'):
+            self.letter_index = letters.letter_index
+        else:
+            self.letter_index = {l.id: k for k, l in enumerate(letters)}
+        self.index_of = getattr(letters, 'index_of', None)
+        self.successor = [UNKNOWN] * (nstates * self.nletters)
+
 class ERA:
     '''
     an object of this class is an event recording automaton
@@ -86,10 +199,9 @@ class ERA:
         self.active_clocks = []
         
         self.states = dict()
-        self.transitions = [[] for i in range(self.nstates)]  # transitions[src][tgt] = [t1, t2]
+        self.transitions = Transitions()  # transitions[src][tgt] = [t1, t2]
         for i in range(n):
             self.states[i] = State('q' + str(i), i)
-            self.transitions[i] = [[] for i in range(self.nstates)]
         self.curr_state = 0 # index of current state of the automaton
         self.transitions_on_event = dict()  # type = {e: [(src, tgt), (src, tgt)]}
         self.transitions_from_state_on_events = {}  # type = {src: {e: [g1, g2]}}
@@ -97,6 +209,15 @@ class ERA:
         
         self.is_deterministic = True    #currently not being updated when a transition is added or a product is constructed
 
+        self.letter_table = None    # see compile_letters, dropped whenever the automaton changes
+
+    def __getstate__(self) -> dict:
+        # the letter table is indexed by ids of symbolic events,
+        # which are local to a process: it is not copied
+        state = self.__dict__.copy()
+        state['letter_table'] = None
+        return state
+
     def __str__(self) -> str:
         output_str = f'number of states: {self.states_count()}'
         for e in self.events:
@@ -110,7 +231,7 @@ class ERA:
             output_str += f'\nlocation:{q}{{'
             if q.init:
                 output_str += 'initial,'
-            if q.accepting:
+            if self.is_final(q.index()):
                 output_str += 'accepting'
             if q.dc:
                 output_str += "don't care"
@@ -118,11 +239,10 @@ class ERA:
         for state_i in self.states.keys():
             if not self.states[state_i].status:
                 continue
-            for state_j in self.states.keys():
-                if not self.states[state_j].status:
+            for each_transition in self.transitions.from_state(state_i):
+                if not each_transition.tgt.status:
                     continue
-                for each_transition in self.transitions[state_i][state_j]:
-                    output_str += f'\ntransition:{each_transition}'
+                output_str += f'\ntransition:{each_transition}'
         output_str += '\n\ndeterministic? '
         if self.is_deterministic:
             output_str += 'Yes\n'
@@ -130,48 +250,87 @@ class ERA:
             output_str += 'No\n'
         return output_str
 
-    def __mul__(self, a: object):
+    def transitions_by_event(self) -> dict:
+        ''' return a dict {src: {name of event: [(guard, tgt)]}} 
+            of the outgoing transitions of every state
+        '''
+        index = {q: {} for q in range(self.nstates)}
+        for src_index in range(self.nstates):
+            for t in self.transitions.from_state(src_index):
+                index[src_index].setdefault(t.event.name, []).append((t.guard, t.tgt.index()))
+        return index
+
+    def write_product_to_file(self, a: object, outfile: str, sysname: str = 'my_sys') -> None:
+        ''' write the product self * a to a file in TChecker syntax 
+            (same syntax as write_era_to_file), without constructing it:
+            only the pairs of states reachable from the initial pairs are 
+            written, and pairs of transitions whose guards do not intersect
+            are dropped
+
+            arguments:
+                a       : an ERA over the same events as self
+                outfile : file where the product is to be written
+        '''
         assert self.events == a.events
-        n_1 = self.nstates
-        n_2 = a.nstates
-        n = n_1 * n_2
-        out_era = ERA(n)
-        out_era.events = self.events[:]
-        out_era.active_clocks = self.active_clocks[:]
-
-        for i in range(n_1):
-            for j in range(n_2):
+        out_1 = self.transitions_by_event()
+        out_2 = a.transitions_by_event()
+
+        # pairs[k] is the k-th reachable pair of states, location l{k} of the product
+        pairs = [(i, j) for i in range(self.nstates) if self.states[i].init
+                        for j in range(a.nstates) if a.states[j].init]
+        index = {pair: k for k, pair in enumerate(pairs)}
+        edges = []
+        k = 0
+        while k < len(pairs):
+            i, j = pairs[k]
+            for e_name, transitions_1 in out_1[i].items():
+                transitions_2 = out_2[j].get(e_name)
+                if transitions_2 is None:
+                    continue
+                for g1, tgt_1 in transitions_1:
+                    for g2, tgt_2 in transitions_2:
+                        if g1 == g2:
+                            g = g1
+                        elif intersects(g1, g2):
+                            g = expression.ConjExpression((g1, g2))
+                        else:
+                            continue
+                        tgt = (tgt_1, tgt_2)
+                        if tgt not in index:
+                            index[tgt] = len(pairs)
+                            pairs.append(tgt)
+                        edges.append((k, index[tgt], e_name, g.expr))
+            k += 1
+
+        active = {e.name for e in self.active_clocks}
+        with open(f'{outfile}', 'w') as outfile:
+            outfile.write(f'system:{sysname}\n\n')
+
+            for e in self.events:
+                outfile.write(f'event:{e.name}\n')
+            outfile.write('\n')
+
+            for e in self.active_clocks:
+                outfile.write(f'clock:1:{e.name}\n')
+            outfile.write('\n')
+
+            outfile.write('process:P0\n')
+            for k, (i, j) in enumerate(pairs):
+                outfile.write(f'location:P0:l{k}{{')
+                attributes = []
                 if self.states[i].init and a.states[j].init:
-                    out_era.make_initial(i * n_2 + j)
-                if self.states[i].accepting and a.states[j].accepting:
-                    out_era.make_final(i * n_2 + j)
-                if self.states[i].dc or a.states[j].dc:
-                    out_era.states[i * n_2 + j].dc
-
-                out_era.states[i * n_2 + j].status = self.states[i].status and a.states[j].status
-
-        for i1, j1 in itertools.product(range(n_1), range(n_1)):
-            for each_self_transition in self.transitions[i1][j1]:
-                e = each_self_transition.event
-                g = each_self_transition.guard
-                for i2, j2 in itertools.product(range(n_2), range(n_2)):
-                    for each_a_transition in a.transitions[i2][j2]:
-                        src = out_era.states[i1 * n_2 + i2]
-                        tgt = out_era.states[j1 * n_2 + j2]
-
-                        if each_a_transition.event == e:
-                            if each_a_transition.guard == g:
-                                new_guard = g
-                            else:
-                                new_guard = expression.ConjExpression((g, each_a_transition.guard))
-
-                            out_era.nd_add_transition(src, e, new_guard, tgt)
-        
-        if self.is_deterministic and a.is_deterministic:
-            out_era.is_deterministic = True
-        
-        return out_era
+                    attributes.append('initial:')
+                if self.is_final(i) and a.is_final(j):
+                    attributes.append('labels: accepting')
+                outfile.write(':'.join(attributes))
+                outfile.write('} \n')
+            outfile.write('\n')
 
+            for src_index, tgt_index, e_name, g in edges:
+                if e_name in active:
+                    outfile.write(f'edge:P0:l{src_index}:l{tgt_index}:{e_name}{{provided:{g} : do:{e_name}=0}}\n')
+                else:
+                    outfile.write(f'edge:P0:l{src_index}:l{tgt_index}:{e_name}{{provided:{g}}}\n')
 
     def states_count(self) -> int:
         ''' return the number of states present in an ERA
@@ -180,6 +339,23 @@ class ERA:
         '''
         return sum([1 for q in self.states.values() if q.status == True])
     
+    def compile_letters(self, letters: list, eager: bool = False) -> None:
+        ''' tabulate the successors of every state on the given letters,
+            so that step answers them by a lookup
+
+            the table is filled lazily, when a (state, letter) pair 
+            is read for the first time; if eager is True, it is filled here
+
+            Arguments:
+                letters : a list of symbolic events
+                eager   : whether to compute every entry of the table now
+        '''
+        self.letter_table = LetterTable(self.nstates, letters)
+        if eager:
+            for q in self.states.values():
+                for letter in letters:
+                    self.step(q, letter)
+
     def step(self, q: State, s: symbolicword.SymEvent) -> State:
         ''' given a guarded letter w:=(a,g), 
             this function executes one transition 
@@ -196,16 +372,37 @@ class ERA:
         '''
         # q must be a valid state 
         if q is None: return None
+
+        table = self.letter_table
+        if table is not None:
+            k = table.letter_index.get(s.id)
+            if k is None and table.index_of is not None:
+                k = table.index_of(s)
+            if k is not None:
+                cell = q.index() * table.nletters + k
+                tgt = table.successor[cell]
+                if tgt == UNKNOWN:
+                    q_next = self.find_successor(q, s)
+                    table.successor[cell] = NO_SUCCESSOR if q_next is None else q_next.index()
+                    return q_next
+                if tgt == NO_SUCCESSOR:
+                    return None
+                return self.states[tgt]
+
+        return self.find_successor(q, s)
+
+    def find_successor(self, q: State, s: symbolicword.SymEvent) -> State:
+        ''' same as step, but searches the transitions of q 
+            instead of looking up the letter table
+        '''
         # assert q.status == True
 
         a = s.event
         g = s.guard
-        for q1 in range(self.nstates):
-            for t in self.transitions[q.index()][q1]:
-                if t.event == a:
-                    # intersection is sufficient since g is a region-word
-                    if intersects(g, t.guard):
-                        return t.tgt
+        for t in self.transitions.on_event(q.index(), a.name):
+            # intersection is sufficient since g is a region-word
+            if intersects(g, t.guard):
+                return t.tgt
                     
     def read_word(self, q_start, w: symbolicword.SymWord):
         '''input: start state, and a symbolic word
@@ -246,7 +443,15 @@ class ERA:
 
         if q is None:
             return False
-        return q.accepting
+        return self.is_final(q.index())
+
+    def is_final(self, q_index: int) -> bool:
+        ''' return True if the state with index q_index is accepting
+
+            every method deciding acceptance goes through is_final,
+            so that views (see ERAView) can change the accepting states
+        '''
+        return self.states[q_index].accepting
     
     def complement(self):
         '''complement the automaton in-place (does not create a new automaton)
@@ -260,6 +465,7 @@ class ERA:
             self.states[q].accepting = not(self.states[q].accepting)
 
     def add_state(self) -> State:
+        self.letter_table = None
         index_of_new_state = self.nstates
         old_nstates = self.nstates
         self.nstates += 1
@@ -270,13 +476,7 @@ class ERA:
                                  index_of_new_state)
         self.states[index_of_new_state] = new_state
         
-        # add transitions
-        # step 1: no incoming transitions to the new state
-        for each in range(old_nstates):
-            self.transitions[each].append([])
-        # step 2: no outgoing transitions from the new state
-        self.transitions.append([[] for i in range(self.nstates)])
-        
+        # the new state has no transitions yet
         return new_state
 
     def out_transitions(self, src: State):
@@ -284,7 +484,7 @@ class ERA:
     
     def has_transition(self, src: State, event: event.Event, guard: expression.Expression, tgt: State) -> bool:
         if guard.expr == 'True':
-            for each_transition in self.transitions[src.index()][tgt.index()]:
+            for each_transition in list(self.transitions[src.index()][tgt.index()]):
                 self.del_transition(each_transition)
             return False
         
@@ -316,22 +516,35 @@ class ERA:
     def nd_add_transition(self, src: State, 
                           event: event.Event, 
                           guard: expression.Expression,
-                          tgt: State) -> None:
+                          tgt: State) -> Transition:
         
-        self.transitions[src.index()][tgt.index()].append(Transition(src, tgt, event, guard))
+        self.letter_table = None
+        t = Transition(src, tgt, event, guard)
+        self.transitions.add(t)
         self.transitions_on_event.setdefault(event.name, []).append((src.index(), tgt.index()))
         self.transitions_from_state_on_events.setdefault(src.index(), {}). setdefault(event.name, []).append(guard)
         self.transitions_on_letters_from_state.setdefault((event.name, guard.expr), {}). setdefault(src.index(), []).append(tgt.index())
+        return t
        
+    def del_transition(self, t: Transition) -> None:
+        self.letter_table = None
+        src = t.src.index()
+        tgt = t.tgt.index()
+        self.transitions.remove(t)
+        self.transitions_on_event[t.event.name].remove((src, tgt))
+        self.transitions_from_state_on_events[src][t.event.name].remove(t.guard)
+        self.transitions_on_letters_from_state[(t.event.name, t.guard.expr)][src].remove(tgt)
+
     
     def del_state(self, state: State) -> None:
+        self.letter_table = None
         state.status = False
         
         if state.accepting == True: 
             state.accepting = False
 
         # no outgoing transitions from state
-        self.transitions[state.index()] = [[] for i in range(self.nstates)]
+        self.transitions.clear_from(state.index())
 
     def remove_sinks(self) -> None:
         ''' remove sink states from the automaton
@@ -339,11 +552,7 @@ class ERA:
         '''
         sink_states = []
         for q in self.states.keys():
-            for qp in self.states.keys():
-                if ((q != qp) and 
-                    (self.transitions[q][qp] != [])):
-                    break
-            else:
+            if all(qp == q for qp in self.transitions.targets(q)):
                 sink_states.append(q)
         
         for q in sink_states:
@@ -373,78 +582,138 @@ class ERA:
 
 
     def find_incompatible_pairs(self) -> list:
-        ''' returns a list of pairs (as a set) of indices that are incompatible'''
-
-        def is_transition_to_incompatible(src1, src2, tgt: set):
-            for transition_from_src1 in self.transitions[src1][list(tgt)[0]]:
-                for transition_from_src2 in self.transitions[src2][list(tgt)[1]]:
-                    if transition_from_src1.event == transition_from_src2.event and transition_from_src1.guard == transition_from_src2.guard:
-                        return({src1,src2})
-            for transition_from_src1 in self.transitions[src1][list(tgt)[1]]:
-                for transition_from_src2 in self.transitions[src2][list(tgt)[0]]:
-                    if transition_from_src1.event == transition_from_src2.event and transition_from_src1.guard == transition_from_src2.guard:
-                        return({src1,src2})
-                    
-        incompatible_pairs = []
-        
+        ''' returns a list of pairs (as a set) of indices that are incompatible
+
+            two states are incompatible if one is accepting and the other
+            is rejecting (and not don't care), or if they have transitions 
+            on the same letter to incompatible states; the latter pairs are 
+            found backwards from the former, following the transitions 
+            into incompatible pairs (a pair is reached once, from the first
+            incompatible pair that leads to it)
+
+            the pairs are listed by increasing distance from the first
+            kind of pairs, and in lexicographic order for the same distance
+        '''
         n = len(self.states)
 
+        # predecessors[tgt] = {letter: [sources of the transitions on letter to tgt]},
+        # a letter is an event together with the set of valuations of its guard
+        predecessors = [dict() for q in range(n)]
+        for src in range(n):
+            for t in self.transitions.from_state(src):
+                letter = (t.event.name, guards.canonical_key(t.guard))
+                predecessors[t.tgt.index()].setdefault(letter, []).append(src)
+
+        # incompatible[i] is a bitset: bit j is set iff {i, j} is incompatible
+        incompatible = [0] * n
+        def mark(i: int, j: int) -> None:
+            incompatible[i] |= 1 << j
+            incompatible[j] |= 1 << i
+
         # add every pair of {accepting, rejecting} in incompatible_pairs
+        level = []
         for i in range(n):
             for j in range(i+1, n):
-                if ((not self.states[i].accepting and not self.states[i].dc) and (self.states[j].accepting)):
-                    incompatible_pairs.append({i,j})
-                elif ((not self.states[j].accepting and not self.states[j].dc) 
-                       and (self.states[i].accepting)):
-                    incompatible_pairs.append({i,j})
-
-        # add pairs as long as you can
-        while True:
-            incompatible_pairs_c = incompatible_pairs[:]
-            for i in range(n):
-                for j in range(i+1,n):
-                    if {i,j} in incompatible_pairs:
+                if ((not self.is_final(i) and not self.states[i].dc and self.is_final(j)) or
+                    (not self.is_final(j) and not self.states[j].dc and self.is_final(i))):
+                    mark(i, j)
+                    level.append((i, j))
+
+        incompatible_pairs = []
+        while level:
+            incompatible_pairs += [{i, j} for i, j in level]
+            next_level = []
+            for p, q in level:
+                into_p, into_q = predecessors[p], predecessors[q]
+                for letter, sources_p in into_p.items():
+                    sources_q = into_q.get(letter)
+                    if sources_q is None:
                         continue
-                    for pair in incompatible_pairs:
-                        # check for transition i -> pair[0] and j -> pair[1] or v.v.
-                        new_pair = is_transition_to_incompatible(i, j, pair)
-                        if new_pair is not None:
-                            incompatible_pairs_c.append(new_pair)
-                        
-            # condition to stop the while loop : if no new pair is added
-            if len(incompatible_pairs) == len(incompatible_pairs_c):
-                break
-            incompatible_pairs = incompatible_pairs_c[:]
+                    for i in sources_p:
+                        for j in sources_q:
+                            if i != j and not (incompatible[i] >> j) & 1:
+                                mark(i, j)
+                                next_level.append((min(i, j), max(i, j)))
+            level = sorted(next_level)
         return incompatible_pairs
 
-    def find_maximal_compatible_sets(self) -> list:
-        ''' returns a list of sets of indices
-        for which the corresponding states are maximal and pairwise compatible'''
-         
+    def compatibility_graph(self) -> list:
+        ''' returns a list of bitsets: bit j of the i-th bitset is set 
+            iff i != j and the states i and j are compatible
+        '''
         n = len(self.states)
-        incompatible_pairs = self.find_incompatible_pairs()
+        everything = (1 << n) - 1
+        compatible = [everything & ~(1 << i) for i in range(n)]
+        for i, j in self.find_incompatible_pairs():
+            compatible[i] &= ~(1 << j)
+            compatible[j] &= ~(1 << i)
+        return compatible
+
+    def find_maximal_compatible_sets(self, limit: int = None, compatible: list = None) -> list:
+        ''' returns a list of sets of indices
+        for which the corresponding states are maximal and pairwise compatible
 
-        maximal_sets = [{index for index in range(n)}]    #keys to the states
-        
-        change = True
-        while change:
-            change = False
-            maximal_sets_c = maximal_sets[:]   
-            for element in maximal_sets:
-                for x,y in incompatible_pairs:
-                    if ((x in element) and (y in element)):
-                        change = True
-                        maximal_sets_c.remove(element)
-                        if all(not (element-{x}).issubset(t) for t in maximal_sets_c):
-                            maximal_sets_c.append(element-{x}) 
-                        if all(not (element-{y}).issubset(t) for t in maximal_sets_c):
-                            maximal_sets_c.append(element-{y})
-                        if change:
-                            break
-            maximal_sets = maximal_sets_c
+        these are the maximal cliques of the compatibility graph, enumerated 
+        with the Bron-Kerbosch algorithm (with pivoting); if limit is not None,
+        at most limit cliques are enumerated, and the states they miss are 
+        covered greedily (see extend_to_maximal_compatible_set), so that 
+        every state is in some set of the list
+
+        compatible is the compatibility graph (computed if None)'''
         
+        n = len(self.states)
+        if compatible is None:
+            compatible = self.compatibility_graph()
+
+        cliques = []
+        def bron_kerbosch(r: int, p: int, x: int) -> None:
+            # r: the clique, p: candidates to extend it, x: excluded candidates
+            if p == 0 and x == 0:
+                cliques.append(r)
+                return
+            # the pivot u has the most neighbours in p, the neighbours of u 
+            # need not be tried: any clique with them extends with u or a non-neighbour
+            u = max(bits(p | x), key=lambda u: bin(p & compatible[u]).count('1'))
+            for v in bits(p & ~compatible[u]):
+                if limit is not None and len(cliques) >= limit:
+                    return
+                bron_kerbosch(r | (1 << v), p & compatible[v], x & compatible[v])
+                p &= ~(1 << v)
+                x |= 1 << v
+        if limit != 0 and n > 0:
+            bron_kerbosch(0, (1 << n) - 1, 0)
+
+        maximal_sets = [set(bits(r)) for r in cliques]
+        covered = 0
+        for r in cliques:
+            covered |= r
+        for q in range(n):
+            if not (covered >> q) & 1:
+                maximal_set = self.extend_to_maximal_compatible_set({q}, compatible)
+                maximal_sets.append(maximal_set)
+                for q1 in maximal_set:
+                    covered |= 1 << q1
         return maximal_sets
 
+    def extend_to_maximal_compatible_set(self, states: set, compatible: list = None) -> set:
+        ''' returns a maximal set of pairwise compatible states containing states
+            (which must be pairwise compatible), adding the states greedily 
+            by increasing index
+
+            compatible is the compatibility graph (computed if None)
+        '''
+        if compatible is None:
+            compatible = self.compatibility_graph()
+        candidates = (1 << len(self.states)) - 1
+        for q in states:
+            candidates &= compatible[q]
+        maximal_set = set(states)
+        while candidates:
+            q = (candidates & -candidates).bit_length() - 1
+            maximal_set.add(q)
+            candidates &= compatible[q]
+        return maximal_set
+
     def description_for_tchecker(self, P: str):
         description = ''
         
@@ -458,7 +727,7 @@ class ERA:
             if self.states[j].init:
                 attributes.append('initial:')
             # no attribute for accepting states
-            if self.states[j].accepting:
+            if self.is_final(j):
                 attributes.append(f'labels:{P}accepting')
             description += ':'.join(attributes)
             description += '} \n'
@@ -467,22 +736,22 @@ class ERA:
         
         # define edges
         for src_index in range(self.nstates):
-            for tgt_index in range(self.nstates):
-                for each_transition in self.transitions[src_index][tgt_index]:
-                    e = each_transition.event
-                    g = each_transition.guard.expr
-                    if e in self.active_clocks:
-                        # print(f'found {e} to be active')
-                        if g == 'True':
-                            description += f'edge:{P}:l{src_index}:l{tgt_index}:{e.name}{{do:{e.name}=0}}\n'
-                        else:
-                            description += f'edge:{P}:l{src_index}:l{tgt_index}:{e.name}{{provided:{g} : do:{e.name}=0}}\n'
+            for each_transition in self.transitions.from_state(src_index):
+                tgt_index = each_transition.tgt.index()
+                e = each_transition.event
+                g = each_transition.guard.expr
+                if e in self.active_clocks:
+                    # print(f'found {e} to be active')
+                    if g == 'True':
+                        description += f'edge:{P}:l{src_index}:l{tgt_index}:{e.name}{{do:{e.name}=0}}\n'
                     else:
-                        # print(f'found {e} to be not active')
-                        if g == 'True':
-                            description += f'edge:{P}:l{src_index}:l{tgt_index}:{e.name}{{}}\n'
-                        else:
-                            description += f'edge:{P}:l{src_index}:l{tgt_index}:{e.name}{{provided:{g}}}\n'
+                        description += f'edge:{P}:l{src_index}:l{tgt_index}:{e.name}{{provided:{g} : do:{e.name}=0}}\n'
+                else:
+                    # print(f'found {e} to be not active')
+                    if g == 'True':
+                        description += f'edge:{P}:l{src_index}:l{tgt_index}:{e.name}{{}}\n'
+                    else:
+                        description += f'edge:{P}:l{src_index}:l{tgt_index}:{e.name}{{provided:{g}}}\n'
 
         return description
 
@@ -524,7 +793,7 @@ class ERA:
                     if self.states[j].init:
                         attributes.append('initial:')
                     # no attribute for accepting states
-                    if self.states[j].accepting:
+                    if self.is_final(j):
                         attributes.append('labels: accepting')
                     outfile.write(':'.join(attributes))
                     outfile.write('} \n')
@@ -532,14 +801,53 @@ class ERA:
                 outfile.write('\n')
 
                 for src_index in range(self.nstates):
-                    for tgt_index in range(self.nstates):
-                        for each_transition in self.transitions[src_index][tgt_index]:
-                            e = each_transition.event
-                            g = each_transition.guard.expr
-                            if e in self.active_clocks:
-                                # print(f'found {e} to be active')
-                                outfile.write(f'edge:P{i}:l{src_index}:l{tgt_index}:{e.name}{{provided:{g} : do:{e.name}=0}}\n')
-                            else:
-                                # print(f'found {e} to be not active')
-                                outfile.write(f'edge:P{i}:l{src_index}:l{tgt_index}:{e.name}{{provided:{g}}}\n')
+                    for each_transition in self.transitions.from_state(src_index):
+                        tgt_index = each_transition.tgt.index()
+                        e = each_transition.event
+                        g = each_transition.guard.expr
+                        if e in self.active_clocks:
+                            # print(f'found {e} to be active')
+                            outfile.write(f'edge:P{i}:l{src_index}:l{tgt_index}:{e.name}{{provided:{g} : do:{e.name}=0}}\n')
+                        else:
+                            # print(f'found {e} to be not active')
+                            outfile.write(f'edge:P{i}:l{src_index}:l{tgt_index}:{e.name}{{provided:{g}}}\n')
 
+
+class ERAView(ERA):
+    ''' an ERA that shares the states, transitions and events of base,
+        but may have other accepting states (see is_final)
+
+        a view is read-only: attributes are looked up in base, and the 
+        methods of ERA (products, files for TChecker, ...) called on a view
+        see the accepting states of the view
+    '''
+    def __init__(self, base: ERA) -> None:
+        # the attributes of ERA are not initialized: they are the ones of base
+        self.base = base
+
+    def __getattr__(self, name: str):
+        if name == 'base':     # not set yet, e.g. while unpickling
+            raise AttributeError(name)
+        return getattr(self.base, name)
+
+    def is_final(self, q_index: int) -> bool:
+        return self.base.is_final(q_index)
+
+class ComplementView(ERAView):
+    ''' the complement of a deterministic ERA, without copying it
+        (same as complement, but base is not modified)
+    '''
+    def __init__(self, base: ERA) -> None:
+        if not base.is_deterministic:
+            raise TypeError('era.py: the complement method currently supports only deterministic ERAs')
+        super().__init__(base)
+
+    def is_final(self, q_index: int) -> bool:
+        return not self.base.is_final(q_index)
+
+class DontCareAcceptingView(ERAView):
+    ''' base where the don't care states are accepting, without copying it
+        (same as make_dc_states_accepting, but base is not modified)
+    '''
+    def is_final(self, q_index: int) -> bool:
+        return self.base.is_final(q_index) or self.base.states[q_index].dc
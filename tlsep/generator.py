@@ -0,0 +1,251 @@
+''' this file implements a generator of random deterministic and complete ERAs,
+    written in the syntax of file-format.md (see parse.build_era_from_file)
+
+    the guards of the transitions out of a state on an event partition the
+    valuations of the clocks they read: for every clock, the half-line [0, inf)
+    is cut at random integers in [0, m] into intervals (possibly points),
+    and a guard is a product of one interval per clock. so the generated ERA
+    is deterministic and complete, and every state is reachable
+    (a random spanning tree is laid first). it need not be minimal.
+
+    families --
+    random     : random guards and targets
+    dont-care  : every event is active and every guard reads every clock,
+                 so many region words are empty (don't care entries in the table)
+    long-cex   : a chain of states where one precise letter leads to the next state
+                 and every other letter to a sink, so that counterexamples are long
+
+    a sweep writes one automaton per combination of parameters, and
+    a manifest (manifest.json) with the parameters of every file,
+    which benchmark.py attaches to its results:
+
+        python3 generator.py --out ../sweep --states 5 10 20 --seeds 0 1 2
+        python3 benchmark.py ../sweep --inclusion zonegraph
+'''
+
+import argparse
+import itertools
+import json
+import os
+import random
+
+FAMILIES = ['random', 'dont-care', 'long-cex']
+
+def event_names(nevents: int) -> list:
+    if nevents <= 26:
+        return [chr(ord('a') + i) for i in range(nevents)]
+    return [f'e{i}' for i in range(nevents)]
+
+def partition(rng: random.Random, m: int, ncuts: int, cut_at_m: bool = False) -> list:
+    ''' cut [0, inf) at ncuts random integers in [0, m] (and at m if cut_at_m)
+
+        returns:
+            the list of intervals, every interval is a tuple
+            (lower, lower_strict, upper, upper_strict), upper is None if unbounded
+    '''
+    cuts = set(rng.sample(range(m + 1), min(ncuts, m + 1)))
+    if cut_at_m:
+        cuts.add(m)
+    cuts = sorted(cuts)
+    intervals = []
+    lower, lower_strict = 0, False
+    for c in cuts:
+        kind = rng.choice(['point', 'left', 'right'])
+        if kind == 'point':     # ... < c, c, c < ...
+            if (lower, lower_strict) != (c, False):
+                intervals.append((lower, lower_strict, c, True))
+            intervals.append((c, False, c, False))
+            lower, lower_strict = c, True
+        elif kind == 'left':    # ... < c, c <= ...
+            if (lower, lower_strict) != (c, False):
+                intervals.append((lower, lower_strict, c, True))
+                lower, lower_strict = c, False
+        else:                   # ... <= c, c < ...
+            intervals.append((lower, lower_strict, c, False))
+            lower, lower_strict = c, True
+    intervals.append((lower, lower_strict, None, False))
+    return intervals
+
+def interval_to_guard(clock: str, interval: tuple) -> list:
+    ''' return the simple expressions (as strings) of clock in interval
+    '''
+    lower, lower_strict, upper, upper_strict = interval
+    if upper == lower:
+        return [f'{clock}=={lower}']
+    constraints = []
+    if lower_strict:
+        constraints.append(f'{clock}>{lower}')
+    elif lower > 0:
+        constraints.append(f'{clock}>={lower}')
+    if upper is not None:
+        constraints.append(f'{clock}<{upper}' if upper_strict else f'{clock}<={upper}')
+    return constraints
+
+def guards_of(rng: random.Random, clocks: list, m: int, max_cuts: int, force: str = None) -> list:
+    ''' return a list of guards (as strings) partitioning the valuations of clocks,
+        if force is a clock of clocks, it is cut at m
+    '''
+    pieces = []
+    for clock in clocks:
+        intervals = partition(rng, m, rng.randint(1, max_cuts), cut_at_m=(clock == force))
+        pieces.append([interval_to_guard(clock, interval) for interval in intervals])
+    guards = []
+    for product in itertools.product(*pieces):
+        constraints = [c for piece in product for c in piece]
+        guards.append('&&'.join(constraints) if constraints else 'True')
+    return guards
+
+def generate(nstates: int, nevents: int, nclocks: int, m: int,
+             density: float = 0.5, clocks_per_guard: int = 1, max_cuts: int = 2,
+             accepting: float = 0.5, family: str = 'random', seed: int = 0) -> str:
+    ''' return the description of a random deterministic and complete ERA
+
+        arguments:
+            nstates          : number of states
+            nevents          : number of events
+            nclocks          : number of active clocks (the clocks of the first events)
+            m                : maximum constant of the guards
+            density          : probability that the transitions out of a state on
+                               an event have guards (otherwise one transition with True)
+            clocks_per_guard : maximum number of clocks read by a guard
+            max_cuts         : maximum number of cuts of a clock
+            accepting        : probability that a state is accepting
+            family           : one of FAMILIES
+            seed             : seed of the random generator
+    '''
+    if family not in FAMILIES:
+        raise ValueError(f'generator.py: unknown family {family}')
+    if nstates < 1 or nevents < 1 or not (0 <= nclocks <= nevents):
+        raise ValueError('generator.py: invalid parameters')
+    if family == 'long-cex':
+        if nstates < 2:
+            raise ValueError('generator.py: the family long-cex needs at least 2 states')
+        return generate_chain(nstates, nevents, nclocks, m, seed)
+
+    rng = random.Random(seed)
+    events = event_names(nevents)
+    clocks = events[:nclocks]
+    if family == 'dont-care':
+        clocks = events
+        density = 1
+        clocks_per_guard = nevents
+
+    # the guards of every state and event: slots[(q, e)] = [guard, ...]
+    # every clock is read at least once, and the first one is cut at m
+    slots = {}
+    unused = list(clocks)
+    for q in range(nstates):
+        for e in events:
+            if clocks and (unused or rng.random() < density):
+                read = set(rng.sample(clocks, rng.randint(1, min(clocks_per_guard, len(clocks)))))
+                if unused:
+                    read.add(unused.pop())
+                force = clocks[0] if (q, e) == (0, events[0]) else None
+                if force:
+                    read.add(force)
+                slots[(q, e)] = guards_of(rng, sorted(read), m, max_cuts, force)
+            else:
+                slots[(q, e)] = ['True']
+    targets = {(q, e, g): None for (q, e), guards in slots.items() for g in guards}
+
+    # a spanning tree, so that every state is reachable
+    free = []
+    for q in range(1, nstates):
+        free += [slot for slot in targets if slot[0] == q - 1]
+        slot = free.pop(rng.randrange(len(free)))
+        targets[slot] = q
+    for slot in targets:
+        if targets[slot] is None:
+            targets[slot] = rng.randrange(nstates)
+
+    final = [rng.random() < accepting for q in range(nstates)]
+    if nstates > 1 and all(final) or not any(final):
+        final[rng.randrange(nstates)] = not final[0]
+    return describe(events, set(clocks), nstates, final, targets)
+
+def generate_chain(nstates: int, nevents: int, nclocks: int, m: int, seed: int) -> str:
+    ''' the family long-cex: states 0, ..., n-2 form a chain, state n-1 is a sink,
+        and only the last state of the chain is accepting
+    '''
+    rng = random.Random(seed)
+    events = event_names(nevents)
+    clocks = events[:max(nclocks, 1)]
+    sink = nstates - 1
+    targets = {}
+    for q in range(nstates):
+        for e in events:
+            if q == sink or q == nstates - 2:
+                targets[(q, e, 'True')] = sink
+            elif e == events[q % nevents]:
+                # exactly one point of one clock leads to the next state
+                clock = rng.choice(clocks)
+                c = rng.randint(0, m) if q > 0 else m
+                targets[(q, e, f'{clock}=={c}')] = q + 1
+                if c > 0:
+                    targets[(q, e, f'{clock}<{c}')] = sink
+                targets[(q, e, f'{clock}>{c}')] = sink
+            else:
+                targets[(q, e, 'True')] = sink
+    final = [q == nstates - 2 for q in range(nstates)]
+    return describe(events, set(clocks), nstates, final, targets)
+
+def describe(events: list, clocks: set, nstates: int, final: list, targets: dict) -> str:
+    ''' return the description of the ERA in the syntax of file-format.md
+    '''
+    lines = [f'event:{e}{{{"active" if e in clocks else ""}}}' for e in events]
+    for q in range(nstates):
+        flags = (['initial'] if q == 0 else []) + (['accepting'] if final[q] else [])
+        lines.append(f'location:q{q}{{{",".join(flags)}}}')
+    for (q, e, g), tgt in targets.items():
+        lines.append(f'transition:q{q}:q{tgt}:{e}:{g}')
+    return '\n'.join(lines)
+
+def sweep(out: str, parameters: dict, family: str = 'random') -> list:
+    ''' write one automaton to the directory out for every combination of
+        parameters (a dict {argument of generate: list of values}),
+        together with the manifest out/manifest.json
+
+        returns:
+            the manifest, a list of dicts {'file': name of the file, argument: value, ...}
+    '''
+    os.makedirs(out, exist_ok=True)
+    names = list(parameters)
+    manifest = []
+    for values in itertools.product(*(parameters[name] for name in names)):
+        kwargs = dict(zip(names, values))
+        try:
+            description = generate(family=family, **kwargs)
+        except ValueError:      # e.g. more clocks than events
+            continue
+        filename = family + ''.join(f'-{name}{value}' for name, value in kwargs.items()) + '.txt'
+        with open(os.path.join(out, filename), 'w') as f:
+            f.write(description)
+        manifest.append(dict(file=filename, family=family, **kwargs))
+    with open(os.path.join(out, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description="generate random deterministic and complete ERAs")
+    argparser.add_argument('--out', dest='out', type=str, required=True,
+                                    help="directory where the automata are written", metavar="<str>")
+    argparser.add_argument('--family', dest='family', type=str, choices=FAMILIES, default='random')
+    argparser.add_argument('--states', dest='nstates', type=int, nargs='+', default=[5], metavar="<int>")
+    argparser.add_argument('--events', dest='nevents', type=int, nargs='+', default=[2], metavar="<int>")
+    argparser.add_argument('--clocks', dest='nclocks', type=int, nargs='+', default=[1],
+                                       help="number of active clocks", metavar="<int>")
+    argparser.add_argument('--max-constant', dest='m', type=int, nargs='+', default=[1], metavar="<int>")
+    argparser.add_argument('--density', dest='density', type=float, nargs='+', default=[0.5],
+                                        help="probability that a state has guards on an event", metavar="<float>")
+    argparser.add_argument('--clocks-per-guard', dest='clocks_per_guard', type=int, nargs='+', default=[1],
+                                                 metavar="<int>")
+    argparser.add_argument('--seeds', dest='seed', type=int, nargs='+', default=[0], metavar="<int>")
+    args = argparser.parse_args()
+
+    parameters = {name: getattr(args, name) for name in
+                  ['nstates', 'nevents', 'nclocks', 'm', 'density', 'clocks_per_guard', 'seed']}
+    if args.family != 'random':     # the density and the guards are fixed by the family
+        parameters.pop('density')
+        parameters.pop('clocks_per_guard')
+    manifest = sweep(args.out, parameters, args.family)
+    print(f'{len(manifest)} automata written to {args.out}')
@@ -0,0 +1,191 @@
+''' this file implements an interval representation of guards
+
+    a guard of an ERA is a conjunction of simple constraints x ~ c,
+    where x is an event-clock and c is a non-negative integer.
+    every clock is therefore constrained by (at most) one interval,
+    and questions like "does g1 intersect g2?" or "is g1 contained in g2?"
+    can be answered exactly by comparing these intervals clock by clock.
+'''
+
+import expression
+
+class Interval:
+    ''' an interval of non-negative reals
+
+    attributes --
+    lower        : lower endpoint (an integer, at least 0)
+    lower_strict : True if the lower endpoint is excluded from the interval
+    upper        : upper endpoint (an integer), None if the interval is unbounded
+    upper_strict : True if the upper endpoint is excluded from the interval
+    '''
+    __slots__ = ('lower', 'lower_strict', 'upper', 'upper_strict')
+
+    def __init__(self, lower: int = 0, lower_strict: bool = False,
+                       upper: int = None, upper_strict: bool = False) -> None:
+        self.lower = lower
+        self.lower_strict = lower_strict
+        self.upper = upper
+        self.upper_strict = upper_strict
+
+    def __str__(self) -> str:
+        left = '(' if self.lower_strict else '['
+        if self.upper is None:
+            return f'{left}{self.lower}, inf)'
+        right = ')' if self.upper_strict else ']'
+        return f'{left}{self.lower}, {self.upper}{right}'
+
+    def __eq__(self, __o: object) -> bool:
+        return self.key() == __o.key()
+
+    def __hash__(self) -> int:
+        return hash(self.key())
+
+    def key(self) -> tuple:
+        return (self.lower, self.lower_strict, self.upper, self.upper_strict)
+
+    def is_empty(self) -> bool:
+        if self.upper is None:
+            return False
+        if self.lower < self.upper:
+            return False
+        if self.lower == self.upper:
+            return self.lower_strict or self.upper_strict
+        return True
+
+    def intersect(self, other: 'Interval') -> 'Interval':
+        ''' return the intersection of self and other
+        '''
+        # the larger lower endpoint wins, on a tie the strict one
+        if self.lower > other.lower:
+            lower, lower_strict = self.lower, self.lower_strict
+        elif self.lower < other.lower:
+            lower, lower_strict = other.lower, other.lower_strict
+        else:
+            lower, lower_strict = self.lower, self.lower_strict or other.lower_strict
+
+        # the smaller upper endpoint wins, on a tie the strict one
+        if other.upper is None:
+            upper, upper_strict = self.upper, self.upper_strict
+        elif self.upper is None or self.upper > other.upper:
+            upper, upper_strict = other.upper, other.upper_strict
+        elif self.upper < other.upper:
+            upper, upper_strict = self.upper, self.upper_strict
+        else:
+            upper, upper_strict = self.upper, self.upper_strict or other.upper_strict
+
+        return Interval(lower, lower_strict, upper, upper_strict)
+
+    def contains(self, other: 'Interval') -> bool:
+        ''' return True  if other is a subset of self
+                   False otherwise
+            (the empty interval is a subset of every interval)
+        '''
+        if other.is_empty():
+            return True
+        # compare the lower endpoints
+        if other.lower < self.lower:
+            return False
+        if (other.lower == self.lower and
+            self.lower_strict and not other.lower_strict):
+            return False
+        # compare the upper endpoints
+        if self.upper is None:
+            return True
+        if other.upper is None or other.upper > self.upper:
+            return False
+        if (other.upper == self.upper and
+            self.upper_strict and not other.upper_strict):
+            return False
+        return True
+
+UNCONSTRAINED = Interval()
+
+def interval_of_constraint(c: expression.SimpleExpression) -> Interval:
+    ''' return the interval of values of the clock of c that satisfy c
+    '''
+    bound = c.bound()
+    op_str = c.op_str()
+    if op_str == 'lt':
+        return Interval(0, False, bound, True)
+    elif op_str == 'le':
+        return Interval(0, False, bound, False)
+    elif op_str == 'eq':
+        return Interval(bound, False, bound, False)
+    elif op_str == 'ge':
+        return Interval(bound, False, None, False)
+    elif op_str == 'gt':
+        return Interval(bound, True, None, False)
+    else:
+        raise ValueError('guards.py: unexpected operator found in guard')
+
+# canonical forms are cached by the string of the guard,
+# since expressions are compared structurally and are not hashable
+_canonical_forms = {}
+
+def canonicalize(g: expression.Expression) -> dict:
+    ''' given a guard g (True, a simple or a conjunctive expression),
+        return a dict {clock name: Interval} with one interval
+        for every clock constrained by g
+
+        clocks that do not appear in g are unconstrained
+    '''
+    intervals = _canonical_forms.get(g.expr)
+    if intervals is not None:
+        return intervals
+
+    intervals = {}
+    for each in g.conjuncts():
+        if each.type == 'True':
+            continue
+        clk = each.get_event().name
+        interval = interval_of_constraint(each)
+        if clk in intervals:
+            interval = intervals[clk].intersect(interval)
+        intervals[clk] = interval
+
+    _canonical_forms[g.expr] = intervals
+    return intervals
+
+def canonical_key(g: expression.Expression):
+    ''' return a hashable representation of the set of valuations of g,
+        two guards have the same key iff they define the same set
+    '''
+    intervals = canonicalize(g)
+    if any(interval.is_empty() for interval in intervals.values()):
+        return None     # every empty guard has the same key
+    return frozenset((clk, interval.key()) for clk, interval in intervals.items()
+                                           if interval != UNCONSTRAINED)
+
+def is_empty(g: expression.Expression) -> bool:
+    '''return TRUE  if no valuation satisfies g
+              FALSE otherwise
+    '''
+    return any(interval.is_empty() for interval in canonicalize(g).values())
+
+def intersects(g1: expression.Expression, g2: expression.Expression) -> bool:
+    '''returns TRUE  if g1 intersects g2,
+               FALSE otherwise
+    '''
+    intervals_1 = canonicalize(g1)
+    intervals_2 = canonicalize(g2)
+    for clk, interval in intervals_1.items():
+        if clk in intervals_2:
+            interval = interval.intersect(intervals_2[clk])
+        if interval.is_empty():
+            return False
+    for clk, interval in intervals_2.items():
+        if clk not in intervals_1 and interval.is_empty():
+            return False
+    return True
+
+def is_contained(g1: expression.Expression, g2: expression.Expression) -> bool:
+    '''return TRUE  if g1 is contained in g2
+              FALSE otherwise
+    '''
+    if is_empty(g1):
+        return True
+    intervals_1 = canonicalize(g1)
+    for clk, interval in canonicalize(g2).items():
+        if not interval.contains(intervals_1.get(clk, UNCONSTRAINED)):
+            return False
+    return True
@@ -1,6 +1,14 @@
 from z3 import *
 
 import expression
+import guards
+import z3session
+
+# which procedure answers is_contained and intersects:
+#   'native' : interval arithmetic on the guards (see guards.py)
+#   'z3'     : a query to Z3 for every call
+#   'check'  : both, and raise an AssertionError if they disagree
+guard_backend = 'native'
 
 def encode_constraint(g: expression.SimpleExpression,
                       clock_list: dict):
@@ -28,13 +36,14 @@ def create_vars_for_clks(g: expression.ConjExpression,
     '''given a constraint g,
         add a Real variable to list_of_clocks
         corresponding to every clock present in g
+        (the variables are those of the session 'guards', see z3session.py)
     '''
     atoms_of_g = g.conjuncts() # all the atomic constraints present in g
 
     for each in atoms_of_g:
         nameofevent = each.event.get_event()
         if nameofevent not in list_of_clocks.keys():
-            list_of_clocks[nameofevent] = Real(nameofevent)
+            list_of_clocks[nameofevent] = z3session.session('guards').real(nameofevent)
 
 
 def constraint_to_clause(g: expression.ConjExpression,
@@ -51,39 +60,59 @@ def constraint_to_clause(g: expression.ConjExpression,
     
     return phi
 
-def is_contained(g1: expression.ConjExpression, g2: expression.ConjExpression) -> bool:
-    '''return TRUE  if g1 is contained in g2
-              FALSE otherwise
+def clause_of_guard(g: expression.ConjExpression) -> list:
+    ''' return the constraints of g, together with
+        the non-negativity of the clocks present in g
     '''
     list_of_clocks = {}
-    create_vars_for_clks(g1, list_of_clocks)
-    create_vars_for_clks(g2, list_of_clocks)
-
-    g1_c = constraint_to_clause(g1, list_of_clocks)
-    g2_c = constraint_to_clause(g2, list_of_clocks)
+    create_vars_for_clks(g, list_of_clocks)
+    return [x >= 0 for x in list_of_clocks.values()] + [constraint_to_clause(g, list_of_clocks)]
 
-    s = Solver()
-    for x in list_of_clocks.keys():
-        s.add(list_of_clocks[x] >= 0)
-    s.add(Not(Implies(g1_c, g2_c)))
-    return (str(s.check()) == 'unsat')
+def z3_is_contained(g1: expression.ConjExpression, g2: expression.ConjExpression) -> bool:
+    '''return TRUE  if g1 is contained in g2
+              FALSE otherwise
+       (decided using Z3: g1 is kept in the solver of the session 'guards'
+        for the next query with the same g1)
+    '''
+    g2_c = clause_of_guard(g2)
+    query = g2_c[:-1] + [Not(g2_c[-1])]
+    return not z3session.session('guards').is_sat([g1.expr], lambda i: clause_of_guard(g1), query)
 
 
-def intersects(g1: expression.ConjExpression, g2: expression.ConjExpression) -> bool:
+def z3_intersects(g1: expression.ConjExpression, g2: expression.ConjExpression) -> bool:
     '''returns TRUE  if g1 intersects g2, 
                FALSE otherwise
+       (decided using Z3, as in z3_is_contained)
     '''
-    list_of_clocks = {}
-    create_vars_for_clks(g1, list_of_clocks)
-    create_vars_for_clks(g2, list_of_clocks)
+    return z3session.session('guards').is_sat([g1.expr], lambda i: clause_of_guard(g1), clause_of_guard(g2))
 
-    g1_c = constraint_to_clause(g1, list_of_clocks)
-    g2_c = constraint_to_clause(g2, list_of_clocks)
+def is_contained(g1: expression.ConjExpression, g2: expression.ConjExpression) -> bool:
+    '''return TRUE  if g1 is contained in g2
+              FALSE otherwise
+    '''
+    if guard_backend == 'native':
+        return guards.is_contained(g1, g2)
+    elif guard_backend == 'z3':
+        return z3_is_contained(g1, g2)
+    elif guard_backend == 'check':
+        ans = guards.is_contained(g1, g2)
+        assert ans == z3_is_contained(g1, g2), f'helper.py: is_contained disagrees with Z3 on {g1} and {g2}'
+        return ans
+    else:
+        raise ValueError(f'helper.py: unknown guard backend {guard_backend}')
 
-    s = Solver()
-    for x in list_of_clocks.keys():
-        s.add(list_of_clocks[x] >= 0)
-    s.add(And(g1_c, g2_c))
 
-    return (str(s.check()) == 'sat')
-    
\ No newline at end of file
+def intersects(g1: expression.ConjExpression, g2: expression.ConjExpression) -> bool:
+    '''returns TRUE  if g1 intersects g2,
+               FALSE otherwise
+    '''
+    if guard_backend == 'native':
+        return guards.intersects(g1, g2)
+    elif guard_backend == 'z3':
+        return z3_intersects(g1, g2)
+    elif guard_backend == 'check':
+        ans = guards.intersects(g1, g2)
+        assert ans == z3_intersects(g1, g2), f'helper.py: intersects disagrees with Z3 on {g1} and {g2}'
+        return ans
+    else:
+        raise ValueError(f'helper.py: unknown guard backend {guard_backend}')
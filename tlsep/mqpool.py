@@ -0,0 +1,76 @@
+''' this file implements the parallel execution of membership queries
+
+    membership queries are independent of each other, so a large batch
+    of them (a new column, or the rows of S.A) is split into chunks that 
+    are answered by a pool of worker processes. every worker holds its own
+    copy of the sul (with its table of successors on the region letters)
+    and its own trie of queried words (see prefixtrie.py).
+
+    a worker returns the path of every query (the zones and the states of
+    the sul it computed), which is grafted onto the trie of the calling
+    process in the order of the batch: the trie ends up as if the queries
+    had been answered there, so later queries reuse them, and the counters
+    (MQc, sul_steps) do not depend on the number of workers or on which
+    worker answered which chunk
+'''
+
+import concurrent.futures
+
+import helper
+import acceptance
+import era
+import prefixtrie
+
+workers = 1         # number of worker processes, 1 answers every query in the calling process
+min_batch = 512     # smaller batches are answered in the calling process
+chunk_size = 256    # number of queries sent to a worker at once
+
+# the trie of queried words of a worker process
+_runs = None
+
+def _init_worker(sul: era.ERA, clocks: list, letters: list,
+                 guard_backend: str, emptiness_backend: str) -> None:
+    global _runs
+    helper.guard_backend = guard_backend
+    acceptance.emptiness_backend = emptiness_backend
+    # the letters of the queries are interned again in this process,
+    # the table resolves their indices when they are read (see RegionAlphabet.index_of)
+    sul.compile_letters(letters)
+    _runs = prefixtrie.PrefixTrie(sul, clocks)
+
+def _export(queries: list) -> list:
+    return [_runs.export(p, s, depth) for p, s, depth in queries]
+
+class QueryPool:
+    ''' a pool of worker processes answering membership queries on sul
+    '''
+    def __init__(self, sul: era.ERA, clocks: list, letters: list, nworkers: int) -> None:
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+                            max_workers=nworkers, initializer=_init_worker,
+                            initargs=(sul, clocks, letters, helper.guard_backend,
+                                      acceptance.emptiness_backend))
+
+    def member(self, runs: prefixtrie.PrefixTrie, pairs: list) -> list:
+        ''' answer the membership query p.s for every (p, s) in pairs,
+            only the queries that runs cannot answer are sent to the workers,
+            and their paths are grafted onto runs
+
+            returns:
+                the list of (answer, computed), in the order of pairs
+                (see prefixtrie.PrefixTrie.member)
+        '''
+        paths = [None] * len(pairs)
+        queries, positions = [], []
+        for i, (p, s) in enumerate(pairs):
+            answered, depth = runs.known(p, s)
+            if not answered:
+                queries.append((p, s, depth))
+                positions.append(i)
+        chunks = [queries[i:i+chunk_size] for i in range(0, len(queries), chunk_size)]
+        exported = (path for chunk in self.executor.map(_export, chunks) for path in chunk)
+        for i, path in zip(positions, exported):
+            paths[i] = path
+        return [runs.member(p, s, path) for (p, s), path in zip(pairs, paths)]
+
+    def shutdown(self) -> None:
+        self.executor.shutdown()
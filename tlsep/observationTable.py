@@ -1,14 +1,41 @@
 import itertools
-import copy
 from collections import defaultdict
 from prettytable import PrettyTable
+import numpy as np
 
 import expression
+import guards
+import dbm
 import symbolicword
 import era
 import acceptance
+import columnartable
+import prefixtrie
+import querylog
+import mqpool
 import stats
 
+def regions_of_clock(m: int, x: str) -> list:
+    ''' return the regions of the clock x, in increasing order, 
+        as a list of pairs (guard, interval of values of x)
+
+        arguments:
+
+        m = max constant
+        x = name of the clock
+    '''
+    regions = []
+    for i in range(m):
+        regions.append((expression.SimpleExpression(f'{x}=={i}'),
+                        guards.Interval(i, False, i, False)))
+        regions.append((expression.ConjExpression(f'{x}>{i}&&{x}<{i+1}'),
+                        guards.Interval(i, True, i+1, True)))
+    regions.append((expression.SimpleExpression(f'{x}=={m}'),
+                    guards.Interval(m, False, m, False)))
+    regions.append((expression.SimpleExpression(f'{x}>{m}'),
+                    guards.Interval(m, True, None, False)))
+    return regions
+
 def create_list_of_regions(m: int, events_list: list):
     ''' create a list of all the regions 
         
@@ -18,59 +45,191 @@ def create_list_of_regions(m: int, events_list: list):
         n_clocks = number of clocks
     '''
     regions = []
-    regions_per_clock = [[] for x in range(len(events_list))] 
-    for j in range(len(events_list)): # for every clock
-        x = str(events_list[j])
-        for i in range(m):
-            regions_per_clock[j].append(expression.SimpleExpression(f'{x}=={i}'))
-            regions_per_clock[j].append(expression.ConjExpression(f'{x}>{i}&&{x}<{i+1}'))
-        regions_per_clock[j].append(expression.SimpleExpression(f'{x}=={m}'))
-        regions_per_clock[j].append(expression.SimpleExpression(f'{x}>{m}'))
+    regions_per_clock = [[g for g, interval in regions_of_clock(m, str(x))] 
+                                                for x in events_list]
     for region in itertools.product(*regions_per_clock):
         regions.append(expression.ConjExpression(region))
     return regions
 
+class RegionAlphabet:
+    ''' the alphabet of symbolic events (a, r), where a is an event 
+        and r is a region of the active clocks, in the order of 
+        itertools.product(events, create_list_of_regions(m, clocks))
+
+        the letters are only constructed when they are accessed, and 
+        feasible_letters tells which letters can be read after a prefix,
+        so that the rows of the infeasible extensions are never built
+
+        attributes --
+        events       : list of events
+        clocks       : names of the active clocks
+        regions      : regions[j] is the list of (guard, interval) of clocks[j]
+        nregions     : number of regions of the active clocks
+        letter_index : dict {id of a constructed or resolved letter: index of the letter}
+    '''
+    def __init__(self, events: list, m: int, active_clocks: list) -> None:
+        self.events = events
+        self.clocks = [str(x) for x in active_clocks]
+        self.regions = [regions_of_clock(m, x) for x in self.clocks]
+        self.nregions = 1
+        for regions in self.regions:
+            self.nregions *= len(regions)
+        self.letters = {}   # index of a letter -> the letter
+        self.letter_index = {}
+        # to resolve the index of a symbolic event (see index_of)
+        self.event_index = {a.name: i for i, a in enumerate(events)}
+        self.interval_index = [{interval.key(): i for i, (g, interval) in enumerate(regions)}
+                               for regions in self.regions]
+        self.not_letters = set()    # ids of the symbolic events that are not letters
+
+    def __getstate__(self) -> dict:
+        # the ids of symbolic events are local to a process:
+        # the letters are constructed again after unpickling
+        state = self.__dict__.copy()
+        state['letters'] = {}
+        state['letter_index'] = {}
+        state['not_letters'] = set()
+        return state
+
+    def __len__(self) -> int:
+        return len(self.events) * self.nregions
+
+    def __getitem__(self, k: int) -> symbolicword.SymEvent:
+        letter = self.letters.get(k)
+        if letter is None:
+            if not 0 <= k < len(self):
+                raise IndexError('letter index out of range')
+            a = self.events[k // self.nregions]
+            letter = symbolicword.SymEvent.constructUsingEventGuard(
+                                        a, self.region(k % self.nregions))
+            self.letters[k] = letter
+            self.letter_index[letter.id] = k
+        return letter
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
+
+    def index_of(self, s: symbolicword.SymEvent) -> int:
+        ''' return the index of the letter s, None if s is not a letter,
+            without constructing the other letters (e.g. for the letters
+            of the queries sent to a worker process, see mqpool.py)
+        '''
+        k = self.letter_index.get(s.id)
+        if k is not None or s.id in self.not_letters:
+            return k
+        e = self.event_index.get(s.event.name)
+        intervals = guards.canonicalize(s.guard)
+        r = 0
+        if e is not None and len(intervals) == len(self.clocks):
+            for x, interval_index in zip(self.clocks, self.interval_index):
+                i = interval_index.get(intervals[x].key()) if x in intervals else None
+                if i is None:
+                    break
+                r = r * len(interval_index) + i
+            else:
+                k = e * self.nregions + r
+                self.letter_index[s.id] = k
+                return k
+        self.not_letters.add(s.id)
+        return None
+
+    def region(self, r: int) -> expression.ConjExpression:
+        ''' return the guard of the r-th region
+            (the first clock varies the slowest)
+        '''
+        guards_of_region = []
+        for regions in reversed(self.regions):
+            r, i = divmod(r, len(regions))
+            guards_of_region.append(regions[i][0])
+        return expression.ConjExpression(tuple(reversed(guards_of_region)))
+
+    def feasible_regions(self, zone: dbm.DBM) -> list:
+        ''' return the (increasing) indices of the regions that 
+            intersect the zone reached by letting time elapse from zone
+        '''
+        if zone.is_empty():
+            return []
+        zone = zone.copy()
+        zone.elapse()
+
+        feasible = []
+        def extend(j: int, zone: dbm.DBM, r: int) -> None:
+            # the regions of clocks[:j] are fixed, r is their index
+            if j == len(self.clocks):
+                feasible.append(r)
+                return
+            for i, (g, interval) in enumerate(self.regions[j]):
+                z = zone.copy()
+                z.constrain_interval(self.clocks[j], interval)
+                if not z.is_empty():
+                    extend(j+1, z, r * len(self.regions[j]) + i)
+        extend(0, zone, 0)
+        return feasible
+
+    def feasible_letters(self, zone: dbm.DBM) -> list:
+        ''' return the (increasing) indices of the letters that can be 
+            read from zone, all the letters if zone is None (unknown)
+        '''
+        if zone is None:
+            return list(range(len(self)))
+        # the region reached does not depend on the event being read
+        regions = self.feasible_regions(zone)
+        return [e * self.nregions + r for e in range(len(self.events)) 
+                                      for r in regions]
+
 class ObservationTable:
-    def __init__(self, sul: era.ERA, m: int):
+    def __init__(self, sul: era.ERA, m: int, metrics: stats.LearnerMetrics = None,
+                 log: querylog.QueryLog = None):
+        self.metrics = metrics or stats.metrics     # counters and timers of the run (see stats.py)
+        self.log = log      # answers of the membership queries of previous runs (see querylog.py)
         self.L = sul.events[:] # events
         active_clocks = sul.active_clocks[:]
-        R = create_list_of_regions(m, active_clocks) # set of all regions
 
-        self.A = [symbolicword.SymEvent.constructUsingEventGuard(a, g) 
-                                    for a, g in itertools.product(self.L, R)]
+        # the letters (a, r) for every event a and every region r, built lazily
+        self.A = RegionAlphabet(self.L, m, active_clocks)
         
         self.S = [] # rows
         self.E = [] # columns
-        self.T = defaultdict(tuple)
-
-        self.T_symbolic = {}    # keep track which string to which symbolic word
+        self.T = columnartable.ColumnarTable(ncols=1)   # rows are keyed by symbolic words
+        self.successors = {}    # successors[s] = array of the rows of s.a, for s in S and a in A
+        # every infeasible s.a shares the row of this word (all of its entries are '?')
+        self.dead_word = None
+
+        # groups of rows of S (by signature) whose successors were found
+        # to agree: {signature: (rows of the group, number of columns checked)}
+        self.verified_groups = {}
+
+        # the last candidate 3ERA (see generate_3era), the word of S represented 
+        # by every state and its signature when the 3ERA was generated, the 
+        # transitions on the letters of A {(state, k): transition on A[k]} and
+        # the sources of the transitions into every state {state: {(state, k)}}
+        self.hypothesis = None
+        self.hypothesis_rows = []
+        self.hypothesis_signatures = []
+        self.hypothesis_ncols = 0
+        self.hypothesis_transitions = {}
+        self.hypothesis_incoming = defaultdict(set)
         
         self.sul = sul
-        # compute and store the complement of sul (for membership queries)
-        sul_copy = copy.deepcopy(sul)
-
-        sul_copy.complement()
-        self.sul_c = sul_copy
+        # membership queries only read letters of A: tabulate the sul on them
+        self.sul.compile_letters(self.A)
 
         # add the empty word
         empty_word = symbolicword.SymWord([symbolicword.SymEvent('EPSILON')])
         self.S.append(empty_word)
         self.E.append(empty_word)
 
-        self.inconsistent_words = {}
-        self.read_word_in_sul = {}
+        # zones, emptiness and runs of the sul for every queried word
+        self.clocks = [e.name for e in self.L]
+        self.runs = prefixtrie.PrefixTrie(self.sul, self.clocks, self.metrics)
+        self.pool = None    # workers for large batches of membership queries (see mqpool.py)
 
         # check membership of epsilon
-        ans = acceptance.check(self.sul, empty_word)
-        stats.MQ += 1
-        stats.MQc += 1
-        if ans == True:
-            self.T[str(empty_word)] += (1, )
-        else:
-            self.T[str(empty_word)] += (0, )
-        
-        self.T_symbolic[str(empty_word)] = empty_word
-        self.read_word_in_sul[str(empty_word)] = self.sul.initialstate
+        ans = acceptance.check(self.sul, empty_word, self.metrics)
+        self.metrics.count('MQ')
+        self.metrics.count('MQc')
+        self.T.add_row(empty_word, [1 if ans == True else 0])
 
 
     def __str__(self, print_whole_table = False):
@@ -80,17 +239,12 @@ class ObservationTable:
         # print only the S part
         if not print_whole_table:
             for i in range(len(self.S)):
-                table.add_row([str(self.S[i])] + [self.T[str(self.S[i])][j]for j in range(len(self.E))], divider=True)
+                table.add_row([str(self.S[i])] + list(self.T[self.S[i]]), divider=True)
         
         # print the whole table
         elif print_whole_table:
-            for i in self.T.keys():
-                if self.T[i] != ():
-                    table.add_row([i] + [self.T[i][j] for j in range(len(self.E))], divider=True)
-                else:
-                    # uncomment the following line to print the 'empty' rows
-                    # table.add_row([i] + ['?' for j in range(len(self.E))], divider=True)
-                    continue
+            for i in self.T:
+                table.add_row([str(i)] + list(self.T[i]), divider=True)
             
         table.align = 'l'
         table.align['None'] = 'c'
@@ -101,62 +255,68 @@ class ObservationTable:
         '''given a guarded word, 
             query the sul and update the entry in the table
         '''
+        ans, computed = self.member(p, s)
+        self.count_query(ans, computed)
+        return (ans, )
 
-        if s is None:
-            s = symbolicword.SymWord([symbolicword.SymEvent('EPSILON')])
-        
-        w = p + s
-        if str(p) in self.inconsistent_words:
-            self.inconsistent_words[str(w)] = 1
-            return ('?', )
-        # check if w is empty
-        if acceptance.is_empty(w):
-            self.inconsistent_words[str(w)] = 1
-            return ('?', )
-        
-        # Membership query (check if w intersects sul)
-
-        stats.MQ += 1
-        if str(w) in self.read_word_in_sul:
-            q = self.read_word_in_sul[str(w)]
-            return (1, ) if (q is not None and q.accepting) else (0, )
-        
-        stats.MQc += 1 
-        if len(w.symbolic_word) == 1:
-            w1 = symbolicword.SymWord([symbolicword.SymEvent('EPSILON')])
-        else:
-            w1 = symbolicword.SymWord(w.symbolic_word[:-1])
+    def member(self, p: symbolicword.SymWord, s: symbolicword.SymWord = None) -> tuple:
+        ''' answer the membership query p.s from the log if it is there,
+            otherwise from the sul (and record the answer in the log)
 
-        if str(w1) in self.read_word_in_sul:
-            q1 = self.read_word_in_sul[str(w1)]
-            if q1 is None: 
-                self.read_word_in_sul[str(w)] = None
-                return (0, )
-            
-            a = w.symbolic_word[-1]
-            q_f = self.sul.step(q1, a)
-            self.read_word_in_sul[str(w)] = q_f
-
-            if q_f is None:
-                self.read_word_in_sul[str(w)] = None
-                return (0, )
-            
-        else:
-            q_f = self.sul.read_word(self.sul.initialstate, w)
-            self.read_word_in_sul[str(w)] = q_f
+            returns:
+                (answer, computed) - see prefixtrie.PrefixTrie.member
+        '''
+        if self.log is not None:
+            ans = self.log.member(p, s)
+            if ans is not None:
+                return (ans, False)
+        # find (or add) p.s in the trie of queried words,
+        # p.s is not queried if it is empty
+        ans, computed = self.runs.member(p, s)
+        if self.log is not None:
+            self.log.record_member(p, s, ans)
+        return (ans, computed)
+
+    def count_query(self, ans, computed: bool) -> None:
+        if ans != '?':
+            self.metrics.count('MQ')
+        if computed:
+            self.metrics.count('MQc')
+
+    def evaluate_batch(self, pairs: list) -> list:
+        ''' same as evaluate_and_add for every (p, s) in pairs, 
+            answered by the pool of workers if the batch is large enough
 
-            if q_f is None:
-                self.read_word_in_sul[str(w)] = None
-                return (0, )
-            
-        ans = q_f.accepting
-        
-        # intersection is empty iff w is not in L
-        if ans == True:
-            return (1, )
-        elif ans == False:
-            return (0, )
+            returns:
+                the list of the answers, in the order of pairs
+        '''
+        if mqpool.workers <= 1 or len(pairs) < mqpool.min_batch:
+            return [self.evaluate_and_add(p, s) for p, s in pairs]
+
+        if self.pool is None:
+            self.pool = mqpool.QueryPool(self.sul, self.clocks, self.A, mqpool.workers)
+        # only the queries that are not in the log are sent to the workers
+        logged = [None] * len(pairs) if self.log is None else [self.log.member(p, s) for p, s in pairs]
+        missing = [pair for pair, ans in zip(pairs, logged) if ans is None]
+        computed_answers = iter(self.pool.member(self.runs, missing))
+        answers = []
+        for (p, s), ans in zip(pairs, logged):
+            if ans is None:
+                ans, computed = next(computed_answers)
+                if self.log is not None:
+                    self.log.record_member(p, s, ans)
+            else:
+                computed = False
+            self.count_query(ans, computed)
+            answers.append((ans, ))
+        return answers
 
+    def close(self) -> None:
+        ''' stop the workers answering membership queries, if any
+        '''
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
 
     def check_and_update_row(self, prefix: symbolicword.SymWord) -> bool:
         ''' input : a symbolic word
@@ -167,37 +327,60 @@ class ObservationTable:
             additionally, if True, update the entries of the new row
         '''
         
-        if str(prefix) not in self.T.keys():
+        if prefix not in self.T:
             # first, check if prefix is already empty
             ans = self.evaluate_and_add(prefix)
             if ans == ('?', ):
-                self.T[str(prefix)] = tuple(['?' for i in range(len(self.E))])
-                self.T_symbolic[str(prefix)] = prefix
+                self.T.add_row(prefix, ['?' for i in range(len(self.E))])
                 return 
             # if not, add entry corr. to first column, aka EPSILON
-            self.T_symbolic[str(prefix)] = prefix
-            self.T[str(prefix)] += ans
+            values = list(ans)
             
             # now check membership for every column other than (EPSILON, True)
             for s in range(1, len(self.E)):
                 suffix = self.E[s]
                 ans = self.evaluate_and_add(prefix, suffix)
-                self.T[str(prefix)] += ans
+                values += ans
+            self.T.add_row(prefix, values)
             return True
         return False
     
+    def add_rows(self, words: list) -> None:
+        ''' add the rows of the words that are not in the table yet,
+            in the order of words, with a batch of membership queries
+        '''
+        words = [w for w in dict.fromkeys(words) if w not in self.T]
+        answers = self.evaluate_batch([(w, e) for w in words for e in self.E])
+        n = len(self.E)
+        for i, w in enumerate(words):
+            self.T.add_row(w, [ans[0] for ans in answers[i*n:(i+1)*n]])
+
     def add_S_dot_sigma(self, s_list: list = None) -> None:
         s_to_be_added = s_list if s_list is not None else self.S
+        extensions = []  # (prefix, feasible letters, words prefix.a for the feasible letters a)
+        words = []
         for prefix in s_to_be_added:
-            for a in self.A:
-                s_dot_a = prefix + symbolicword.SymWord([a])
-                self.check_and_update_row(s_dot_a)
+            node = self.runs.walk(prefix)[0][-1]
+            feasible = [] if node.empty else self.A.feasible_letters(node.zone)
+            if len(feasible) < len(self.A) and self.dead_word is None:
+                # materialize one infeasible extension for all of them
+                k = next(k for k, l in enumerate(feasible + [len(self.A)]) if k != l)
+                self.dead_word = prefix + symbolicword.SymWord([self.A[k]])
+                words.append(self.dead_word)
+            successors = [prefix + symbolicword.SymWord([self.A[k]]) for k in feasible]
+            words += successors
+            extensions.append((prefix, feasible, successors))
+
+        self.add_rows(words)
+
+        dead_row = -1 if self.dead_word is None else self.T.row_of(self.dead_word)
+        for prefix, feasible, successors in extensions:
+            rows = np.full(len(self.A), dead_row)
+            rows[np.array(feasible, dtype=int)] = [self.T.row_of(w) for w in successors]
+            self.successors[prefix] = rows
 
     def update_new_column(self, e: symbolicword.SymWord):
-        for row in self.T:
-            p = self.T_symbolic[row]
-            ans = self.evaluate_and_add(p, e)
-            self.T[str(p)] += ans
+        self.T.add_column([ans[0] for ans in self.evaluate_batch([(p, e) for p in self.T])])
     
     def close_table(self) -> bool:
         ''' if there exists a row in S.Sigma that is 
@@ -208,19 +391,15 @@ class ObservationTable:
                 False - otherwise
         '''
         new_additions = False
-        values_of_S = [self.T[str(p)] for p in self.S]
+        # signatures of the rows of S and of the prefixes to be added to S
+        signatures = {self.T.signature(self.T.row_of(p)) for p in self.S}
         temp_S = [] # temporarily store the prefixes to be added to S
-        temp_S_values = set() # store the values of T of prefixes in temp_S
         for s in self.S:
-            for a in self.A:
-                p = s + symbolicword.SymWord([a])
-                if self.T[str(p)] == ():
-                    raise NotImplementedError
-                    continue
-                if (self.T[str(p)] not in values_of_S and 
-                    self.T[str(p)] not in temp_S_values):
-                    temp_S.append(p)
-                    temp_S_values.add(self.T[str(p)])
+            for row in self.successors[s].tolist():
+                sig = self.T.signature(row)
+                if sig not in signatures:
+                    temp_S.append(self.T.words[row])
+                    signatures.add(sig)
         if len(temp_S) != 0:
             self.S += temp_S
             self.add_S_dot_sigma(temp_S)
@@ -234,11 +413,13 @@ class ObservationTable:
         consistent = True
         while (not closed or not consistent):
             while not closed:
-                something_new_got_added_making_close = self.close_table()
+                with self.metrics.timed('closing'):
+                    something_new_got_added_making_close = self.close_table()
                 closed = False if something_new_got_added_making_close else True
 
             
-            something_new_got_added_making_consistent = self.consistent_table()
+            with self.metrics.timed('consistency'):
+                something_new_got_added_making_consistent = self.consistent_table()
             consistent = True
             closed = False if something_new_got_added_making_consistent else True
 
@@ -253,41 +434,77 @@ class ObservationTable:
                 True  - if new column got added to E
                 False - otherwise
         '''
-        def find_problematic_suffix(p1: symbolicword.SymWord, p2: symbolicword.SymWord):
-            for index, e in enumerate(self.E):
-                if self.T[str(p1)][index] != self.T[str(p2)][index]:
-                    return e
-            
-        new_additions = False
-        for i in range(len(self.S)):
-            for j in range(i+1,len(self.S)):
-                s1 = self.S[i]
-                s2 = self.S[j]
-                if self.T[str(s1)] == self.T[str(s2)]:
-                    for a in self.A:
-                        p1 = s1 + symbolicword.SymWord([a])
-                        p2 = s2 + symbolicword.SymWord([a])
-                        assert ((str(p1) in self.T.keys()) and (str(p1) in self.T.keys()))
-                        if self.T[str(p1)] != self.T[str(p2)]:                            
-                            # we consider the case when the inequality is due
-                            # to one of the prefixes (p1 or p2) becoming empty
-
-                            problematic_suffix = None
-                            if self.T[str(p1)] == () or self.T[str(p2)] == ():
-                                problematic_suffix = symbolicword.SymWord([symbolicword.SymEvent('EPSILON')])
-                            # now the case when the distinction 
-                            # is not due to emptiness
-
-                            if problematic_suffix is None:
-                                problematic_suffix = find_problematic_suffix(p1, p2)
-                            suffix = symbolicword.SymWord([a]) + problematic_suffix
-
-                            self.E.append(suffix)
-                            self.update_new_column(suffix)
-                            new_additions = True
-                            return new_additions
-        return new_additions
-    
+        # group the rows of S by signature, 
+        # only rows of the same group need to be compared
+        groups = defaultdict(list)
+        for s in self.S:
+            groups[self.T.signature(self.T.row_of(s))].append(s)
+
+        verified = dict()   # the groups verified in this call
+        for sig, members in groups.items():
+            checked, ncols_checked = self.find_verified_group(sig)
+            old = [s for s in members if s in checked]
+            new = [s for s in members if s not in checked]
+
+            if new or ncols_checked < self.T.ncols:
+                # the successors of old members are known to agree on the first
+                # ncols_checked columns, only the other columns are compared
+                ref = old[0] if old else new[0]
+                difference = (self.find_successor_difference(ref, old, ncols_checked) or
+                              self.find_successor_difference(ref, new, 0))
+                if difference is not None:
+                    k, index = difference
+                    suffix = symbolicword.SymWord([self.A[k]]) + self.E[index]
+
+                    self.E.append(suffix)
+                    self.update_new_column(suffix)
+                    # keep the groups verified so far, the next call
+                    # compares them only on the new column
+                    self.verified_groups.update(verified)
+                    return True
+
+            verified[sig] = (frozenset(members), self.T.ncols)
+
+        # every group is consistent: forget the groups of the previous columns
+        self.verified_groups = verified
+        return False
+
+    def find_verified_group(self, sig: bytes) -> tuple:
+        ''' return (members, ncols) for the last verification of the group
+            of rows with signature sig, or of the group it was split from
+            when columns were added since then (prefix of sig); 
+            the successors of members agree on the first ncols columns
+        '''
+        for ncols in range(len(sig), 0, -1):
+            group = self.verified_groups.get(sig[:ncols])
+            if group is not None:
+                return group
+        return (frozenset(), 0)
+
+    def find_successor_difference(self, ref: symbolicword.SymWord, 
+                                  members: list, first_col: int) -> tuple:
+        ''' compare the rows ref.a and s.a, for every s in members
+            and every letter a, on the columns from first_col on
+
+            returns:
+                (k, index) - if ref.A[k] and s.A[k] differ on E[index] for some s
+                None       - otherwise
+        '''
+        if not members or first_col == self.T.ncols:
+            return None
+        # entries[i, k] is the row of members[i].A[k], restricted to the compared columns
+        rows = np.stack([self.successors[ref]] + [self.successors[s] for s in members])
+        entries = self.T.rows(rows)[:, :, first_col:]
+        differs = (entries[1:] != entries[0]).any(axis=2)
+        letters = np.flatnonzero(differs.any(axis=0))
+        if len(letters) == 0:
+            return None
+
+        k = letters[0]
+        i = np.flatnonzero(differs[:, k])[0] + 1
+        index = first_col + np.flatnonzero(entries[i, k] != entries[0, k])[0]
+        return (k, index)
+
     def add_all_prefixes_to_S(self, w: symbolicword.SymWord) -> None:
         for i in range(len(w.symbolic_word)):
             prefix = symbolicword.SymWord(w.symbolic_word[:i+1])
@@ -335,16 +552,17 @@ class ObservationTable:
             # search for the row in S that matches row_for_u
             s = None
             for prefix in self.S:
-                if self.T[str(prefix)] == row_for_u:
+                if self.T[prefix] == row_for_u:
                     s = prefix 
                     break
             else:
                 raise NotImplementedError('no row in S matched with u!')
             
-            new_word = s + v
+            ans, computed = self.member(s, v)
+            accepted = (ans == 1)
 
-            stats.MQ += 1
-            if (not (acceptance.is_empty(new_word)) and self.sul.accepts(new_word) == sul_accepts_w):
+            self.metrics.count('MQ')
+            if (ans != '?' and accepted == sul_accepts_w):
                 left = pos + 1
                 if right < left:
                     ws = symbolicword.SymWord(v.symbolic_word[1:])
@@ -368,12 +586,12 @@ class ObservationTable:
         
         # option 1: add all prefixes of counterexample to S
         if add_all_prefixes == True:
-            stats.all_prefixes += 1
+            self.metrics.count('all_prefixes')
             self.add_all_prefixes_to_S(w)
         
         # option 2: compute the witness suffix (ws) and add it to E
         elif not add_all_prefixes:
-            stats.rs_calls += 1
+            self.metrics.count('rs_calls')
             self.add_ws_to_E(w, hypothesis, states_dict, accepted_by_sul)
         
         else:
@@ -395,7 +613,7 @@ class ObservationTable:
         sorted_symword_list = symbolicword.sort_symword_list(self.S)
         assert (len(self.S) == len(sorted_symword_list))
         for s in sorted_symword_list:
-            distinct_rows[self.T[str(s)]].append(s)
+            distinct_rows[self.T[s]].append(s)
 
         return [r[0] for r in distinct_rows.values()]
 
@@ -403,11 +621,103 @@ class ObservationTable:
         # if want to generate 3ERA using whole Self.S, set the flag 'use_distinct_rows' to False
 
         ''' generate a candidate 3ERA compatible with the observation table
+            (which must be closed and consistent)
+
+            the 3ERA of the previous call is patched: the rows of S whose
+            entries are new get new states, and the transitions into states
+            whose row got split by the new columns are retargeted
+
+        Returns:
+            a : a 3ERA 
+        '''
+        if not use_distinct_rows:
+            return self.build_3era(self.S)
+
+        a = self.hypothesis
+        if a is None:
+            a = era.ERA(0)
+            a.events = self.L[:]
+            a.active_clocks = self.sul.active_clocks[:]
+            self.hypothesis = a
+
+        # the signatures of the states (a row can only split when columns are added)
+        state_of_signature = {self.T.signature(self.T.row_of(rep)): q 
+                              for q, rep in enumerate(self.hypothesis_rows)}
+        previous_states = len(self.hypothesis_rows)
+        previous_state_of_signature = {sig: q for q, sig in enumerate(self.hypothesis_signatures)}
+        ncols = self.hypothesis_ncols
+
+        # new states, for the rows of S that are not represented yet
+        new_rows = [s for s in self.S 
+                    if self.T.signature(self.T.row_of(s)) not in state_of_signature]
+        split = set()
+        for s in symbolicword.sort_symword_list(new_rows):
+            sig = self.T.signature(self.T.row_of(s))
+            if sig in state_of_signature:
+                continue
+            q = a.add_state()
+            state_of_signature[sig] = q.index()
+            self.hypothesis_rows.append(s)
+            if q.index() == 0:
+                a.make_initial(0)   # make the first row initial
+            if self.T.entry(self.T.row_of(s), 0) == 1:
+                a.make_final(q.index())
+            elif self.T.entry(self.T.row_of(s), 0) == '?':
+                a.make_dc(q.index())
+            # the row of s was a row of a previous state before the new columns
+            q_old = previous_state_of_signature.get(sig[:ncols])
+            if q_old is not None:
+                split.add(q_old)
+
+        def target(q: int, k: int) -> int:
+            row = self.successors[self.hypothesis_rows[q]][k]
+            return state_of_signature[self.T.signature(row)]
+
+        # retarget the transitions into split states
+        for q_old in split:
+            for q, k in list(self.hypothesis_incoming[q_old]):
+                tgt = target(q, k)
+                if tgt != q_old:
+                    self.add_hypothesis_transition(q, k, tgt)
+
+        # add transitions of the new states based on S.Sigma
+        for q in range(previous_states, len(self.hypothesis_rows)):
+            for k in range(len(self.A)):
+                self.add_hypothesis_transition(q, k, target(q, k))
+            # complete the 3ERA: if q is the dc state, add self loops
+            if a.states[q].dc:
+                for sigma in self.A:
+                    a.nd_add_transition(a.states[q], sigma.event, sigma.guard, a.states[q])
+
+        self.hypothesis_signatures = [self.T.signature(self.T.row_of(rep)) 
+                                      for rep in self.hypothesis_rows]
+        self.hypothesis_ncols = self.T.ncols
+
+        states_dict = dict() # store which rows the states of a correspond to
+        for q, rep in enumerate(self.hypothesis_rows):
+            states_dict[self.T[rep]] = q
+        return a, states_dict
+
+    def add_hypothesis_transition(self, q: int, k: int, tgt: int) -> None:
+        ''' set the target of the transition of the state q on A[k] to tgt
+        '''
+        a = self.hypothesis
+        t = self.hypothesis_transitions.get((q, k))
+        if t is not None:
+            a.del_transition(t)
+            self.hypothesis_incoming[t.tgt.index()].discard((q, k))
+        sigma = self.A[k]
+        self.hypothesis_transitions[(q, k)] = a.nd_add_transition(a.states[q], sigma.event, 
+                                                                  sigma.guard, a.states[tgt])
+        self.hypothesis_incoming[tgt].add((q, k))
+
+    def build_3era(self, distinct_rows: list) -> era.ERA:
+        ''' generate a candidate 3ERA compatible with the observation table
+            from scratch, with one state for every word in distinct_rows
 
         Returns:
             a : a 3ERA 
         '''
-        distinct_rows = self.get_distinct_rows() if use_distinct_rows else self.S
 
         a = era.ERA(len(distinct_rows)) # no. of states = no. of distinct rows in S
         q_dc = None
@@ -416,27 +726,23 @@ class ObservationTable:
         a.active_clocks = self.sul.active_clocks[:]
         states_dict = dict() # store which rows the states of a correspond to
         for q_index in range(len(distinct_rows)):
-            states_dict[self.T[str(distinct_rows[q_index])]] = q_index
+            states_dict[self.T[distinct_rows[q_index]]] = q_index
 
         a.make_initial(0)   # make the first row initial
         for i in range(len(distinct_rows)):
-            if self.T[str(distinct_rows[i])][0] == 1:
+            if self.T[distinct_rows[i]][0] == 1:
                 a.make_final(i)
-            elif self.T[str(distinct_rows[i])][0] == '?':
+            elif self.T[distinct_rows[i]][0] == '?':
                 a.make_dc(i)
                 q_dc = a.states[i]
 
         # add transitions based on S.Sigma
         for i in range(len(distinct_rows)):
-            for sigma in self.A:
-                prefix = distinct_rows[i] + symbolicword.SymWord([sigma])
-                val = self.T[str(prefix)]
-                if val == ():
-                    a.nd_add_transition(a.states[i], sigma.event, 
-                                        sigma.guard, q_dc)
-                else:
-                    a.nd_add_transition(a.states[i], sigma.event, 
-                                        sigma.guard, a.states[states_dict[val]])
+            successors = self.successors[distinct_rows[i]].tolist()
+            for k, sigma in enumerate(self.A):
+                val = self.T.row(successors[k])
+                a.nd_add_transition(a.states[i], sigma.event, 
+                                    sigma.guard, a.states[states_dict[val]])
         
         # complete the 3ERA: if dc state is not None, add self loops
         if q_dc is not None:
@@ -0,0 +1,202 @@
+''' this file implements a trie of the symbolic words
+    that have been queried by the observation table
+
+    a node of the trie stands for the symbolic word spelled by the
+    ids of the symbolic events on the path from the root to the node,
+    and it stores
+        - the zone reached after reading the word (see dbm.py),
+        - whether the word is empty, and
+        - the state of the sul reached after reading the word.
+
+    a query p.s thus only computes zones and runs the sul
+    from the deepest node of p.s that is already in the trie,
+    and common prefixes of the queried words are stored once
+
+    the nodes computed by another trie (e.g. the trie of a worker
+    process, see mqpool.py) are exported as a path, a list of
+    (zone, empty, index of the state or None) for every node of
+    a word, and grafted onto this trie in place of computing them
+'''
+
+import acceptance
+import dbm
+import era
+import stats
+import symbolicword
+
+class TrieNode:
+    ''' a node of a PrefixTrie
+
+    attributes --
+    children : dict {id of a symbolic event: TrieNode}
+    zone     : zone reached after reading the word of the node
+               (None when emptiness is not decided with DBMs)
+    empty    : True if the word of the node is empty
+    state    : state of the sul reached after reading the word,
+               None if the sul cannot read it (meaningful only if read is True)
+    read     : True if state has been computed
+    '''
+    __slots__ = ('children', 'zone', 'empty', 'state', 'read')
+
+    def __init__(self, zone: dbm.DBM, empty: bool) -> None:
+        self.children = {}
+        self.zone = zone
+        self.empty = empty
+        self.state = None
+        self.read = False
+
+class PrefixTrie:
+    def __init__(self, sul: era.ERA, clocks: list, metrics: stats.LearnerMetrics = None) -> None:
+        self.sul = sul
+        self.metrics = metrics or stats.metrics
+        self.root = TrieNode(dbm.DBM.initial(clocks), False)
+        self.root.state = sul.initialstate
+        self.root.read = True
+        self.nnodes = 1
+
+    def walk(self, p: symbolicword.SymWord, s: symbolicword.SymWord = None,
+                   path: list = None) -> tuple:
+        ''' follow the word p.s from the root, adding the missing nodes
+            (taken from path if it is given, see export)
+
+            returns:
+                (nodes, events) - nodes[i] is the node of the prefix of p.s
+                                  of length i, and events[i] is the symbolic
+                                  event leading from nodes[i] to nodes[i+1]
+
+            the walk stops at the first empty prefix of p.s,
+            so the last node is either the node of p.s or an empty node
+        '''
+        node = self.root
+        nodes = [node]
+        events = []
+        for w in (p, s):
+            if w is None or w.is_epsilon:
+                continue
+            for symbolic_event in w.symbolic_word:
+                if node.empty:
+                    return nodes, events
+                events.append(symbolic_event)
+                child = node.children.get(symbolic_event.id)
+                if child is None and path is not None:
+                    zone, empty, _ = path[len(events)]
+                    child = TrieNode(zone, empty)
+                    node.children[symbolic_event.id] = child
+                    self.nnodes += 1
+                elif child is None:
+                    child = self.add_child(node, symbolic_event, events)
+                node = child
+                nodes.append(node)
+        return nodes, events
+
+    def add_child(self, node: TrieNode, symbolic_event: symbolicword.SymEvent,
+                        events: list) -> TrieNode:
+        ''' add the node reached from node on symbolic_event,
+            events is the word spelled by the new node
+        '''
+        with self.metrics.timed('emptiness'):
+            if acceptance.emptiness_backend == 'dbm':
+                zone = node.zone.step(symbolic_event.event.name, symbolic_event.guard)
+                child = TrieNode(zone, zone.is_empty())
+            else:
+                child = TrieNode(None, acceptance.is_empty(symbolicword.SymWord(events)))
+        node.children[symbolic_event.id] = child
+        self.nnodes += 1
+        return child
+
+    def read(self, nodes: list, events: list, path: list = None) -> era.State:
+        ''' compute the state of the sul for every node in nodes,
+            starting from the deepest node whose state is known
+            (or take it from path if it is given, see export)
+
+            arguments:
+                nodes, events : as returned by walk
+
+            returns:
+                the state of the sul reached at the last node
+        '''
+        k = len(nodes) - 1
+        while not nodes[k].read:
+            k -= 1
+
+        q = nodes[k].state
+        with self.metrics.timed('sul'):
+            for i in range(k+1, len(nodes)):
+                if path is not None:
+                    index = path[i][2]
+                    q = None if index is None else self.sul.states[index]
+                elif q is not None:
+                    q = self.sul.step(q, events[i-1])
+                nodes[i].state = q
+                nodes[i].read = True
+        self.metrics.count('sul_steps', len(nodes) - 1 - k)
+        return q
+
+    def run(self, p: symbolicword.SymWord, s: symbolicword.SymWord = None) -> TrieNode:
+        ''' return the node of p.s with the state of the sul computed,
+            or an empty node if p.s is empty
+        '''
+        nodes, events = self.walk(p, s)
+        if not nodes[-1].empty:
+            self.read(nodes, events)
+        return nodes[-1]
+
+    def member(self, p: symbolicword.SymWord, s: symbolicword.SymWord = None,
+                     path: list = None) -> tuple:
+        ''' answer the membership query p.s, with the missing
+            nodes taken from path if it is given (see export)
+
+            returns:
+                (answer, computed) - answer is '?' if p.s is empty, 
+                                     1 if the sul accepts p.s and 0 otherwise;
+                                     computed is True if the sul had to be run
+        '''
+        nodes, events = self.walk(p, s, path)
+        node = nodes[-1]
+        if node.empty:
+            return ('?', False)
+
+        computed = not node.read
+        if computed:
+            self.read(nodes, events, path)
+        q_f = node.state
+        if q_f is not None and q_f.accepting:
+            return (1, computed)
+        return (0, computed)
+
+    def known(self, p: symbolicword.SymWord, s: symbolicword.SymWord = None) -> tuple:
+        ''' follow the word p.s from the root, without adding nodes
+
+            returns:
+                (answered, depth) - answered is True if member(p, s) would
+                                    not compute anything, depth is the length
+                                    of the longest prefix of p.s whose state is known
+        '''
+        node = self.root
+        depth = 0
+        for w in (p, s):
+            if w is None or w.is_epsilon:
+                continue
+            for symbolic_event in w.symbolic_word:
+                if node.empty:
+                    return (True, depth)
+                node = node.children.get(symbolic_event.id)
+                if node is None:
+                    return (False, depth)
+                if node.read:
+                    depth += 1
+        return (node.empty or node.read, depth)
+
+    def export(self, p: symbolicword.SymWord, s: symbolicword.SymWord = None, depth: int = 0) -> list:
+        ''' answer the membership query p.s, and return its path: a list with
+            (zone, empty, index of the state or None) for every node
+            of p.s deeper than depth, and None for the others
+            (the states are only known if p.s is not empty)
+        '''
+        nodes, events = self.walk(p, s)
+        if not nodes[-1].empty:
+            self.read(nodes, events)
+        path = [None] * min(depth + 1, len(nodes))
+        for node in nodes[len(path):]:
+            path.append((node.zone, node.empty, None if node.state is None else node.state.index()))
+        return path
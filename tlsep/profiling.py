@@ -0,0 +1,256 @@
+''' this file implements the profiling of a run of tLsep (option --profile of tLsep.py)
+
+    two profilers are available --
+    deterministic : cProfile, every call is measured (slower, exact counts)
+    sampling      : the stack of the main thread is sampled every interval
+                    seconds by another thread (cheap, for long runs)
+
+    a profile is written as
+        <prefix>.pstats    : the cProfile data, to be read with pstats (deterministic only)
+        <prefix>.collapsed : one line 'f1;f2;...;fn weight' per stack, the input
+                             of flame graph tools (e.g. flamegraph.pl, speedscope),
+                             the weight is in microseconds
+    and summarized by a table of the time spent in every subsystem of tLsep,
+    with the functions taking the most time in each of them.
+
+    for the deterministic profiler, the stacks are rebuilt from the call graph
+    of cProfile: the time of a function is split among its callers in
+    proportion to the time they spent calling it.
+'''
+
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import defaultdict
+
+# the subsystems of tLsep: the functions of a file belong to its subsystem,
+# unless they are listed in FUNCTION_SUBSYSTEMS
+FILE_SUBSYSTEMS = {'acceptance.py': 'acceptance',
+                   'dbm.py': 'dbm',
+                   'prefixtrie.py': 'observationTable',
+                   'observationTable.py': 'observationTable',
+                   'columnartable.py': 'observationTable',
+                   'symbolicword.py': 'observationTable',
+                   'querylog.py': 'observationTable',
+                   'helper.py': 'helper/Z3',
+                   'guards.py': 'guards',
+                   'z3session.py': 'helper/Z3',
+                   'expression.py': 'expression',
+                   'zonegraph.py': 'zone graph',
+                   'era.py': 'era',
+                   'tLsep.py': 'tLsep',
+                   'subprocess.py': 'TChecker I/O'}
+
+# the files used by several subsystems: their time is spent in the
+# subsystem of their nearest caller that is not one of them
+# (e.g. the DBMs of the zone graph are in 'zone graph'), and in
+# their own subsystem only when no such caller is found
+SHARED_FILES = {'dbm.py', 'expression.py', 'guards.py'}
+
+FUNCTION_SUBSYSTEMS = {('era.py', 'step'): 'era.step',
+                       ('era.py', 'find_successor'): 'era.step',
+                       ('era.py', 'read_word'): 'era.step',
+                       ('era.py', 'accepts'): 'era.step',
+                       ('era.py', 'compile_letters'): 'era.step',
+                       ('era.py', 'write_product_to_file'): 'TChecker I/O',
+                       ('era.py', 'description_for_tchecker'): 'TChecker I/O',
+                       ('era.py', 'write_era_to_file'): 'TChecker I/O',
+                       ('era.py', 'find_incompatible_pairs'): 'minimization',
+                       ('era.py', 'compatibility_graph'): 'minimization',
+                       ('era.py', 'find_maximal_compatible_sets'): 'minimization',
+                       ('era.py', 'bron_kerbosch'): 'minimization',
+                       ('era.py', 'extend_to_maximal_compatible_set'): 'minimization',
+                       ('tLsep.py', 'compute_minimal_dera'): 'minimization',
+                       ('tLsep.py', 'find_set_max_card'): 'minimization',
+                       ('tLsep.py', 'find_containing_set'): 'minimization',
+                       ('tLsep.py', 'add_set'): 'minimization',
+                       ('tLsep.py', 'is_product_empty'): 'TChecker I/O',
+                       ('tLsep.py', 'is_product_empty_noprod'): 'TChecker I/O',
+                       ('tLsep.py', 'cex_of_tchecker_output'): 'TChecker I/O',
+                       ('tLsep.py', 'extract_cex'): 'TChecker I/O',
+                       ('tLsep.py', 'extract_details'): 'TChecker I/O'}
+
+def subsystem(filename: str, funcname: str) -> str:
+    ''' return the subsystem of the function funcname of the file filename,
+        None if it is not a part of tLsep (e.g. a builtin)
+    '''
+    if os.sep + 'z3' + os.sep in filename:
+        return 'helper/Z3'
+    name = os.path.basename(filename)
+    return FUNCTION_SUBSYSTEMS.get((name, funcname), FILE_SUBSYSTEMS.get(name))
+
+def label(func: tuple) -> str:
+    ''' the name of a function (a key of pstats) in the collapsed stacks
+    '''
+    filename, line, funcname = func
+    if filename == '~':     # a builtin
+        return funcname
+    return f'{os.path.basename(filename)}:{funcname}'
+
+class Profiler:
+    ''' the interface of the profilers
+
+    attributes --
+    self_time : dict {function: time spent in the function itself},
+                a function is a tuple (filename, line, name)
+    stacks    : dict {collapsed stack: time spent in it}
+    callers   : dict {function: the function calling it the most}
+    '''
+    def __init__(self) -> None:
+        self.self_time = defaultdict(float)
+        self.stacks = defaultdict(float)
+        self.callers = {}
+
+    def start(self) -> None:
+        raise NotImplementedError
+
+    def stop(self) -> None:
+        raise NotImplementedError
+
+    def write(self, prefix: str) -> list:
+        ''' write the collapsed stacks (and the profiling data, if any)
+            to files starting with prefix, and return their names
+        '''
+        collapsed = f'{prefix}.collapsed'
+        with open(collapsed, 'w') as f:
+            for stack, seconds in sorted(self.stacks.items()):
+                weight = round(seconds * 1e6)
+                if weight > 0:
+                    f.write(f'{stack} {weight}\n')
+        return [collapsed]
+
+    def subsystem_of(self, func: tuple) -> str:
+        ''' the subsystem of func, or of the caller of func if it is not
+            a part of tLsep (e.g. the time of a builtin called by helper.py
+            is spent in helper/Z3) or if it is in one of SHARED_FILES
+        '''
+        seen = set()
+        shared = None   # the subsystem of the first shared function on the way
+        while func is not None and func not in seen:
+            s = subsystem(func[0], func[2])
+            if s is not None:
+                if os.path.basename(func[0]) not in SHARED_FILES:
+                    return s
+                shared = shared or s
+            seen.add(func)
+            func = self.callers.get(func)
+        return shared or 'other'
+
+    def report(self, top: int = 5) -> str:
+        ''' return a table of the time spent in every subsystem
+            and in its top functions (by time spent in the function itself)
+        '''
+        by_subsystem = defaultdict(list)
+        for func, seconds in self.self_time.items():
+            by_subsystem[self.subsystem_of(func)].append((seconds, func))
+        total = sum(self.self_time.values()) or 1
+        lines = [f'{"subsystem":<56} {"time (s)":>10} {"%":>6}']
+        for name, funcs in sorted(by_subsystem.items(), key=lambda item: -sum(s for s, f in item[1])):
+            seconds = sum(s for s, f in funcs)
+            lines.append(f'{name:<56} {seconds:>10.3f} {100 * seconds / total:>6.1f}')
+            for s, func in sorted(funcs, reverse=True)[:top]:
+                lines.append(f'    {label(func):<52} {s:>10.3f}')
+        return '\n'.join(lines)
+
+class DeterministicProfiler(Profiler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.profile = cProfile.Profile()
+        self.stats = None
+
+    def start(self) -> None:
+        self.profile.enable()
+
+    def stop(self) -> None:
+        self.profile.disable()
+        self.stats = pstats.Stats(self.profile)
+        for func, (cc, nc, tt, ct, callers) in self.stats.stats.items():
+            self.self_time[func] = tt
+            if callers:
+                self.callers[func] = max(callers, key=lambda caller: callers[caller][3])
+        self.collapse()
+
+    def collapse(self, min_time: float = 1e-5) -> None:
+        ''' rebuild the stacks from the call graph, dropping the
+            paths that take less than min_time seconds
+        '''
+        stats = self.stats.stats
+        callees = defaultdict(list)
+        for func, (cc, nc, tt, ct, callers) in stats.items():
+            for caller, edge in callers.items():
+                callees[caller].append((func, edge[3]))
+
+        def visit(func: tuple, path: list, on_path: set, ct: float) -> None:
+            # ct is the time spent in func (and its callees) on this path
+            tt_total, ct_total = stats[func][2], stats[func][3]
+            share = ct / ct_total if ct_total > 0 else 0
+            self.stacks[';'.join(path)] += tt_total * share
+            for callee, edge_ct in callees[func]:
+                if callee in on_path:   # recursion: the time is already on the path
+                    continue
+                callee_ct = edge_ct * share
+                if callee_ct >= min_time:
+                    on_path.add(callee)
+                    visit(callee, path + [label(callee)], on_path, callee_ct)
+                    on_path.discard(callee)
+
+        for func, (cc, nc, tt, ct, callers) in stats.items():
+            if not callers:
+                visit(func, [label(func)], {func}, ct)
+
+    def write(self, prefix: str) -> list:
+        self.stats.dump_stats(f'{prefix}.pstats')
+        return [f'{prefix}.pstats'] + super().write(prefix)
+
+class SamplingProfiler(Profiler):
+    ''' samples the stack of the thread calling start every interval seconds
+    '''
+    def __init__(self, interval: float = 0.005) -> None:
+        super().__init__()
+        self.interval = interval
+        self.samples = 0
+        self.running = threading.Event()
+        self.thread = None
+
+    def start(self) -> None:
+        self.target = threading.get_ident()
+        self.running.set()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.running.clear()
+        self.thread.join()
+
+    def sample(self) -> None:
+        last = time.perf_counter()
+        while self.running.is_set():
+            time.sleep(self.interval)
+            if not self.running.is_set():
+                break
+            now = time.perf_counter()
+            frame = sys._current_frames().get(self.target)
+            if frame is None:
+                continue
+            elapsed, last = now - last, now
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples += 1
+            self.self_time[stack[-1]] += elapsed
+            for caller, callee in zip(stack, stack[1:]):
+                self.callers.setdefault(callee, caller)
+            self.stacks[';'.join(label(func) for func in stack)] += elapsed
+
+def make_profiler(mode: str = 'deterministic', interval: float = 0.005) -> Profiler:
+    if mode == 'deterministic':
+        return DeterministicProfiler()
+    elif mode == 'sampling':
+        return SamplingProfiler(interval)
+    raise ValueError(f'profiling.py: unknown profiling mode {mode}')
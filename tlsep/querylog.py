@@ -0,0 +1,158 @@
+''' this file implements a log of the queries asked by tLsep to the sul
+
+    every membership query (a symbolic word and its answer) and every
+    inclusion query (the two automata, by their fingerprint, and the
+    counterexample found) is appended to a text file, one query per line:
+
+        tlsep-querylog 1 <digest of the sul> <m>       (header)
+        M <word> <answer>                               (membership, answer is 0 or 1)
+        I <digest of the two automata> <counterexample> (inclusion, '-' if none)
+
+    where a word is written as its symbolic events (a,g) one after the
+    other ('EPSILON' for the empty word). when the log of a previous run
+    on the same sul and m is opened again, its answers are loaded, so that
+    the queries of a new run are answered from the log, and only the
+    queries that are not in the log are asked to the sul or to the oracle.
+
+    the queries on empty words are not logged: they are never asked to the
+    sul, the trie of queried words answers them (see prefixtrie.py). in
+    memory, a word is keyed by the ids of its symbolic events, so that it is
+    only written as a string when it is recorded. the file is flushed every
+    flush_every membership queries and after every inclusion query, so that
+    the answers of a run that is killed are kept.
+'''
+
+import hashlib
+import os
+import re
+
+import symbolicword
+
+MAGIC = 'tlsep-querylog'
+VERSION = 1
+
+flush_every = 256   # number of membership queries recorded between two flushes
+
+def digest(obj) -> str:
+    ''' return a short digest of repr(obj)
+    '''
+    return hashlib.sha1(repr(obj).encode()).hexdigest()[:20]
+
+def word_to_str(w: symbolicword.SymWord) -> str:
+    if w.is_epsilon:
+        return 'EPSILON'
+    return ''.join(f'({e.event.name},{e.guard.expr})' for e in w.symbolic_word)
+
+def str_to_word(s: str) -> symbolicword.SymWord:
+    if s == 'EPSILON':
+        return symbolicword.SymWord([symbolicword.SymEvent('EPSILON')])
+    return symbolicword.SymWord([symbolicword.SymEvent(e) for e in re.findall(r'\([^()]*\)', s)])
+
+def concat_to_str(p: symbolicword.SymWord, s: symbolicword.SymWord = None) -> str:
+    ''' same as word_to_str(p + s), without building p + s
+    '''
+    if s is None or s.is_epsilon:
+        return word_to_str(p)
+    if p.is_epsilon:
+        return word_to_str(s)
+    return word_to_str(p) + word_to_str(s)
+
+class QueryLog:
+    ''' the queries of the runs of tLsep on one sul
+
+    attributes --
+    membership : dict {ids of the symbolic events of a word: answer}
+    inclusion  : dict {digest of the automata: counterexample as a string, or None}
+    hits       : no. of queries answered from the log
+    misses     : no. of queries recorded in the log
+    '''
+    def __init__(self, path: str, sul_digest: str, m: int) -> None:
+        self.path = path
+        self.membership = {}
+        self.inclusion = {}
+        self.hits = 0
+        self.misses = 0
+        self.unflushed = 0
+        header = f'{MAGIC} {VERSION} {sul_digest} {m}'
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self.load(header)
+            self.file = open(path, 'a')
+        else:
+            self.file = open(path, 'w')
+            self.file.write(header + '\n')
+
+    def load(self, header: str) -> None:
+        with open(self.path) as f:
+            first = f.readline().rstrip('\n')
+            if first != header:
+                raise ValueError(f'querylog.py: {self.path} is not a log of this sul with this m '
+                                 f'(expected "{header}", found "{first}")')
+            events = {}     # {symbolic event as a string: its id}
+            for line in f:
+                fields = line.rstrip('\n').split(' ')
+                if len(fields) != 3:    # e.g. the last line of a run that was killed
+                    continue
+                kind, key, value = fields
+                if kind == 'M' and value in ('0', '1'):
+                    self.membership[self.ids_of(key, events)] = int(value)
+                elif kind == 'I':
+                    self.inclusion[key] = None if value == '-' else value
+
+    @staticmethod
+    def ids_of(key: str, events: dict) -> tuple:
+        ''' return the ids of the symbolic events of the word key (written
+            by word_to_str), events caches the ids of the symbolic events
+        '''
+        if key == 'EPSILON':
+            return ()
+        ids = []
+        for e in re.findall(r'\([^()]*\)', key):
+            id = events.get(e)
+            if id is None:
+                id = events[e] = symbolicword.SymEvent(e).id
+            ids.append(id)
+        return tuple(ids)
+
+    def member(self, p: symbolicword.SymWord, s: symbolicword.SymWord = None):
+        ''' return the logged answer of the membership query p.s, None if it is not logged
+        '''
+        ans = self.membership.get(p.ids if s is None else p.ids + s.ids)
+        if ans is not None:
+            self.hits += 1
+        return ans
+
+    def record_member(self, p: symbolicword.SymWord, s: symbolicword.SymWord, ans) -> None:
+        if ans == '?':      # empty words are not logged
+            return
+        self.membership[p.ids if s is None else p.ids + s.ids] = ans
+        self.misses += 1
+        self.file.write(f'M {concat_to_str(p, s)} {ans}\n')
+        self.unflushed += 1
+        if self.unflushed >= flush_every:
+            self.file.flush()
+            self.unflushed = 0
+
+    def find_inclusion(self, key: str) -> tuple:
+        ''' returns:
+                (True, counterexample) - if the inclusion query key is logged
+                (False, None)          - otherwise
+        '''
+        if key not in self.inclusion:
+            return (False, None)
+        self.hits += 1
+        cex = self.inclusion[key]
+        return (True, None if cex is None else str_to_word(cex))
+
+    def record_inclusion(self, key: str, cex: symbolicword.SymWord) -> None:
+        value = None if cex is None else word_to_str(cex)
+        self.inclusion[key] = value
+        self.misses += 1
+        self.file.write(f'I {key} {"-" if value is None else value}\n')
+        self.file.flush()   # inclusion queries are the expensive ones
+        self.unflushed = 0
+
+    def close(self) -> None:
+        self.file.close()
+
+    def report(self) -> str:
+        return f'{self.path}: {self.hits} queries replayed, {self.misses} queries recorded'
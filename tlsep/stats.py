@@ -1,15 +1,136 @@
-global MQ # no. of membership queries
-global MQc # no. of membership queries with cache
-global EQ # no. of equivalence queries
-global IQ # no. of inclusion queries
+''' this file implements the measures of a run of tLsep
 
-MQ = 0
-EQ = 0
-IQ = 0
-MQc = 0
+    a LearnerMetrics holds the counters of a run (e.g. the number of
+    membership queries) and a Timer for every measured operation
+    (e.g. emptiness checks, runs of the sul, calls to TChecker), with the
+    number of calls, the cumulative time and a histogram of the latencies.
+    it is given to run_tLsep, which passes it to the observation table,
+    to the inclusion queries and to acceptance.py; the functions that are
+    not given one use the module-level metrics.
+'''
 
-global rs_calls
-global all_prefixes
+import json
+import math
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
 
-rs_calls = 0
-all_prefixes = 0
\ No newline at end of file
+# names of the counters --
+#   MQ           : no. of membership queries
+#   MQc          : no. of membership queries with cache
+#   EQ           : no. of equivalence queries
+#   IQ           : no. of inclusion queries
+#   rs_calls     : no. of times Rivest-Schapire was used
+#   all_prefixes : no. of times all_prefixes were added
+#   sul_steps    : no. of letters read by the sul in membership queries
+COUNTERS = ['MQ', 'MQc', 'EQ', 'IQ', 'rs_calls', 'all_prefixes', 'sul_steps']
+
+class Timer:
+    ''' the latencies of one operation
+
+    attributes --
+    count     : no. of calls
+    total     : cumulative time (in seconds)
+    max       : largest latency
+    histogram : histogram[k] is the no. of calls that took
+                less than 2^k microseconds (and at least 2^(k-1))
+    '''
+    __slots__ = ('count', 'total', 'max', 'histogram')
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = defaultdict(int)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.histogram[max(0, math.frexp(seconds * 1e6)[1])] += 1
+
+    def snapshot(self) -> dict:
+        return {'count': self.count, 'total': self.total, 'max': self.max,
+                'mean': self.total / self.count if self.count else 0.0,
+                'histogram': {f'<{2**k}us': n for k, n in sorted(self.histogram.items())}}
+
+class LearnerMetrics:
+    ''' the counters and the timers of a run of tLsep
+
+    attributes --
+    counters : dict {name: value}, see COUNTERS
+    timers   : dict {name of an operation: Timer}
+    live     : if not None, a summary is printed on stderr
+               every live seconds (at the next count or measure)
+    '''
+    def __init__(self, live: float = None) -> None:
+        self.live = live
+        self.reset()
+
+    def reset(self) -> None:
+        ''' set every counter and timer back to 0
+        '''
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.timers = defaultdict(Timer)
+        self.start = time.perf_counter()
+        self.last_summary = self.start
+
+    def __getitem__(self, name: str) -> int:
+        return self.counters.get(name, 0)
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+        if self.live is not None:
+            self.print_live()
+
+    def record(self, name: str, seconds: float) -> None:
+        ''' add a call of the operation name that took seconds
+        '''
+        self.timers[name].add(seconds)
+        if self.live is not None:
+            self.print_live()
+
+    @contextmanager
+    def timed(self, name: str):
+        ''' record the time spent in the with-block as a call of the operation name
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def snapshot(self) -> dict:
+        ''' return the counters and the timers as a JSON-compatible dict
+        '''
+        return {'elapsed': time.perf_counter() - self.start,
+                'counters': dict(self.counters),
+                'timers': {name: timer.snapshot() for name, timer in self.timers.items()}}
+
+    def dump(self, outfile: str) -> None:
+        ''' write the snapshot to outfile, in JSON
+        '''
+        with open(outfile, 'w') as f:
+            json.dump(self.snapshot(), f, indent=1)
+
+    def summary(self) -> str:
+        ''' return the counters and the timers, one line per timer
+            (the timers taking the most time first)
+        '''
+        lines = [f'[{time.perf_counter() - self.start:.1f}s] ' +
+                 ', '.join(f'{name} {value}' for name, value in self.counters.items())]
+        for name, timer in sorted(self.timers.items(), key=lambda item: -item[1].total):
+            lines.append(f'  {name:<16} {timer.count:>9} calls {timer.total:>10.3f}s '
+                         f'(mean {1e3 * timer.total / timer.count:.3f}ms, max {1e3 * timer.max:.3f}ms)')
+        return '\n'.join(lines)
+
+    def print_live(self) -> None:
+        now = time.perf_counter()
+        if now - self.last_summary >= self.live:
+            self.last_summary = now
+            print(self.summary(), file=sys.stderr, flush=True)
+
+# the metrics used when none is given
+metrics = LearnerMetrics()
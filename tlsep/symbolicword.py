@@ -2,6 +2,21 @@ from collections import defaultdict
 
 import event
 import expression
+import guards
+
+# every symbolic event is interned: symbolic events on the same event 
+# whose guards define the same set of valuations share a small integer id
+_symevent_ids = {}
+
+def intern(a: event.Event, g: expression.Expression) -> int:
+    ''' return the id of the symbolic event (a, g)
+    '''
+    key = (a.name, guards.canonical_key(g))
+    id = _symevent_ids.get(key)
+    if id is None:
+        id = len(_symevent_ids)
+        _symevent_ids[key] = id
+    return id
 
 class SymEvent:
     def __init__(self, inp_event: str) -> None:
@@ -15,6 +30,7 @@ class SymEvent:
             event_str, guard = inp_event[1:-1].split(',')
         self.event = event.Event(event_str)
         self.guard = expression.typecheck(guard)
+        self.id = intern(self.event, self.guard)
 
     @classmethod
     def constructUsingEventGuard(cls, a: event.Event, 
@@ -23,6 +39,12 @@ class SymEvent:
         g_str = g.expr
         return cls(f'({a_str},{g_str})')
 
+    def __reduce__(self):
+        # ids are local to a process: intern the symbolic event again when unpickling
+        if self.event.name == 'EPSILON':
+            return (SymEvent, ('EPSILON', ))
+        return (SymEvent, (f'({self.event.name},{self.guard.expr})', ))
+
     def __str__(self) -> str:
         return f'({self.event}, {self.guard})'
     
@@ -33,10 +55,19 @@ class SymEvent:
         return self.guard
     
     def __eq__(self, __o: object) -> bool:
-        return (self.event == __o.event and self.guard == __o.guard)
+        return self.id == __o.id
+
+    def __hash__(self) -> int:
+        return self.id
 
 
 class SymWord:
+    ''' a sequence of symbolic events
+
+        two symbolic words are equal iff they have the same sequence of ids
+        (ids), epsilon has the empty sequence of ids;
+        a SymWord is hashable and must not be modified once constructed
+    '''
     def __init__(self, list_of_symbolic_events: list[SymEvent]) -> None:
         self.symbolic_word = []
         self.is_epsilon = False
@@ -47,30 +78,30 @@ class SymWord:
                 self.is_epsilon = True
             self.symbolic_word.append(symbolic_event)
         self.len = len(self.symbolic_word)
+        self.ids = () if self.is_epsilon else tuple(symbolic_event.id for symbolic_event in self.symbolic_word)
+        self._hash = hash(self.ids)
 
     def __str__(self) -> str:
         return_str = ', '.join([str(symbolic_event) for symbolic_event in self.symbolic_word])
         return return_str
     
+    def __reduce__(self):
+        return (SymWord, (self.symbolic_word, ))
+
     def __eq__(self, __o: object) -> bool:
-        len_of_o = len(__o.symbolic_word)
-        if len_of_o != len(self.symbolic_word):
-            return False
-        for index, symbolic_event in enumerate(self.symbolic_word):
-            if symbolic_event != __o.symbolic_word[index]:
-                return False
-        return True
+        return self.ids == __o.ids
+
+    def __hash__(self) -> int:
+        return self._hash
     
     def __add__(self, __o: object):
-        w = SymWord([])
-        if not self.is_epsilon:
-            w.symbolic_word += self.symbolic_word
-        if not __o.is_epsilon:
-            w.symbolic_word += __o.symbolic_word
         if self.is_epsilon and __o.is_epsilon:
-            w = SymWord([SymEvent('EPSILON')])
-        w.len = len(w.symbolic_word)
-        return w
+            return SymWord([SymEvent('EPSILON')])
+        if __o.is_epsilon:
+            return SymWord(self.symbolic_word)
+        if self.is_epsilon:
+            return SymWord(__o.symbolic_word)
+        return SymWord(self.symbolic_word + __o.symbolic_word)
 
     def __iter__(self):
         return SymEventIter(self)
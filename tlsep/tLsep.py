@@ -1,16 +1,22 @@
 import time
+from collections import deque
 import argparse
 import subprocess
-from copy import deepcopy
 import re
 
 import parse
 import observationTable
 import era
-import event
 import expression
 import symbolicword
 import stats
+import helper
+import acceptance
+import mqpool
+import profiling
+import querylog
+import z3session
+import zonegraph
 from config import tchecker_path
 
 def extract_details(edge: str) -> list:
@@ -83,39 +89,51 @@ def extract_cex(path: str, eventlist: list) -> symbolicword.SymWord:
         assert src not in edges.keys()
         edges[src] = (tgt, (symbolicword.SymEvent.constructUsingEventGuard(event, g)))
         
-    path_word = symbolicword.SymWord([])
+    path_events = []
     curr_state = str(initial_state)
     while curr_state in edges.keys():
-        path_word.symbolic_word.append(edges[curr_state][1])
+        path_events.append(edges[curr_state][1])
         curr_state = edges[curr_state][0]
-    return path_word
+    return symbolicword.SymWord(path_events)
 
-def is_product_empty(a: era.ERA, b: era.ERA):
+def is_product_empty(a: era.ERA, b: era.ERA, tchecker: str = None,
+                     algorithm: str = 'covreach', certificate: str = 'concrete',
+                     metrics: stats.LearnerMetrics = None):
     ''' given two automata, check if a X b is empty 
-        this function, computes the product automaton a X b
-        then, it calls TChecker on this product automaton
+        this function, writes the (reachable part of the) product 
+        automaton a X b, then, it calls TChecker on this product automaton
         to check if the product automaton is empty or not.
         If it is non-empty then TChecker returns a path that leads to 
         one of the final states in the product automaton
 
         arguments:
-            a, b    : two ERAs
+            a, b        : two ERAs
+            tchecker    : path to tck-reach (tchecker_path of config.py if None)
+            algorithm   : reachability algorithm of tck-reach (option -a)
+            certificate : kind of certificate returned by tck-reach (option -C)
+            metrics     : where the time of the product construction ('product')
+                          and of tck-reach ('tchecker') are recorded
         
         returns:
             a file containing the output received from TChecker 
     '''
-    product: era.ERA = a * b
+    tchecker = tchecker or tchecker_path
+    assert tchecker != '', 'config.py: tchecker_path should not be left empty'
+    metrics = metrics or stats.metrics
     input_to_tchecker = './tmp/inputfile.txt'
-    product.write_era_to_file(input_to_tchecker)
+    with metrics.timed('product'):
+        a.write_product_to_file(b, input_to_tchecker)
 
     output_of_tchecker = './tmp/outputfile.txt'
-    with open(f'{output_of_tchecker}', 'w') as outfileobj:
+    with open(f'{output_of_tchecker}', 'w') as outfileobj, metrics.timed('tchecker'):
         # subprocess.call(["./tchecker-lib/install/bin/tck-reach","-a","covreach","-C","symbolic","-l","accepting",input_to_tchecker])
-        subprocess.call([tchecker_path,"-a","covreach","-C","concrete","-l","accepting",input_to_tchecker], stdout=outfileobj, stderr=outfileobj)
+        subprocess.call([tchecker,"-a",algorithm,"-C",certificate,"-l","accepting",input_to_tchecker], stdout=outfileobj, stderr=outfileobj)
     with open(f'{output_of_tchecker}', 'r') as outfileobj:
         return outfileobj.readlines()
 
-def is_product_empty_noprod(a: era.ERA, b: era.ERA):
+def is_product_empty_noprod(a: era.ERA, b: era.ERA, tchecker: str = None,
+                            algorithm: str = 'covreach', certificate: str = 'concrete',
+                            metrics: stats.LearnerMetrics = None):
     ''' given two ERA a and b, check if a * b is empty 
         this function, avoids computing the product automaton a * b
         it instead checks emptiness by considering a and b as 
@@ -124,16 +142,21 @@ def is_product_empty_noprod(a: era.ERA, b: era.ERA):
         one of the final states in the product automaton
 
         arguments:
-            a, b    : two ERA
+            a, b        : two ERA
+            tchecker, algorithm, certificate, metrics : see is_product_empty
+                                                        (the network is recorded as 'product')
         
         returns:
             a file containing the output received from TChecker 
     '''
+    tchecker = tchecker or tchecker_path
+    assert tchecker != '', 'config.py: tchecker_path should not be left empty'
+    metrics = metrics or stats.metrics
     input_to_tchecker = './tmp/inputfile.txt'
     # print(f'checking emptiness of the product of the following automata: {a} {b}')
     a_str = a.description_for_tchecker('P1')
     b_str = b.description_for_tchecker('P2')
-    with open(input_to_tchecker, 'w') as infile:
+    with open(input_to_tchecker, 'w') as infile, metrics.timed('product'):
         infile.write('system:my_sys{}\n\n')
 
         # define events
@@ -156,19 +179,16 @@ def is_product_empty_noprod(a: era.ERA, b: era.ERA):
             infile.write(f'sync:P1@{c}:P2@{c}\n')
 
     output_of_tchecker = './tmp/outputfile.txt'
-    with open(f'{output_of_tchecker}', 'w') as outfileobj:
+    with open(f'{output_of_tchecker}', 'w') as outfileobj, metrics.timed('tchecker'):
         # subprocess.call(["./tchecker-lib/install/bin/tck-reach","-a","covreach","-C","symbolic","-l","accepting",input_to_tchecker])
-        subprocess.call([tchecker_path,"-a","covreach","-C","concrete","-l","P1accepting,P2accepting",input_to_tchecker], stdout=outfileobj, stderr=outfileobj)
+        subprocess.call([tchecker,"-a",algorithm,"-C",certificate,"-l","P1accepting,P2accepting",input_to_tchecker], stdout=outfileobj, stderr=outfileobj)
     with open(f'{output_of_tchecker}', 'r') as outfileobj:
         return outfileobj.readlines()
 
-def check_inclusion(a1: era.ERA, a2: era.ERA) -> symbolicword.SymWord:
-    stats.IQ += 1
-
-    a2_c = deepcopy(a2)
-    a2_c.complement()
-    output_of_tchecker = is_product_empty(a1, a2_c)
-
+def cex_of_tchecker_output(output_of_tchecker: list, eventlist: list) -> symbolicword.SymWord:
+    ''' return the counter-example in the output of TChecker, 
+        None if TChecker found no accepting state
+    '''
     index = 0
     if (len(output_of_tchecker))<2:
         return
@@ -181,162 +201,379 @@ def check_inclusion(a1: era.ERA, a2: era.ERA) -> symbolicword.SymWord:
         if 'digraph' in l:
             index = output_of_tchecker.index(l)
             break
-    cex = extract_cex(output_of_tchecker[index:], a1.events)
+    cex = extract_cex(output_of_tchecker[index:], eventlist)
     return cex
 
-def is_equal(a: era.ERA, b: era.ERA) -> bool:
-    if ((check_inclusion(a,b) == None) and (check_inclusion(b,a) == None)):
+class EmptinessOracle:
+    ''' decides if the product of two ERAs is empty
+
+        subclasses implement search; find_accepting_path times every call,
+        so that the backends can be compared on the same run
+    '''
+    name = 'oracle'
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.time = 0.0
+
+    def find_accepting_path(self, a: era.ERA, b: era.ERA, 
+                            metrics: stats.LearnerMetrics = None) -> symbolicword.SymWord:
+        ''' returns:
+                None    - if no word is accepted by both a and b
+                a symbolic word accepted by both a and b, otherwise
+
+            (the backends record the time of their steps in metrics)
+        '''
+        start = time.time()
+        cex = self.search(a, b, metrics or stats.metrics)
+        self.calls += 1
+        self.time += time.time() - start
+        return cex
+
+    def search(self, a: era.ERA, b: era.ERA, metrics: stats.LearnerMetrics) -> symbolicword.SymWord:
+        raise NotImplementedError
+
+    def report(self) -> str:
+        return f'{self.name}: {self.calls} calls, {self.time:.3f}s'
+
+class TCheckerProductOracle(EmptinessOracle):
+    ''' calls tck-reach on the product automaton a * b (see is_product_empty)
+    '''
+    name = 'tchecker'
+
+    def __init__(self, tchecker: str = None, algorithm: str = 'covreach', 
+                       certificate: str = 'concrete') -> None:
+        super().__init__()
+        self.tchecker = tchecker
+        self.algorithm = algorithm
+        self.certificate = certificate
+
+    def search(self, a: era.ERA, b: era.ERA, metrics: stats.LearnerMetrics) -> symbolicword.SymWord:
+        output = is_product_empty(a, b, self.tchecker, self.algorithm, self.certificate, metrics)
+        return cex_of_tchecker_output(output, a.events)
+
+class TCheckerNetworkOracle(TCheckerProductOracle):
+    ''' calls tck-reach on the network of a and b 
+        synchronized on their events (see is_product_empty_noprod)
+    '''
+    name = 'tchecker-network'
+
+    def search(self, a: era.ERA, b: era.ERA, metrics: stats.LearnerMetrics) -> symbolicword.SymWord:
+        output = is_product_empty_noprod(a, b, self.tchecker, self.algorithm, self.certificate, metrics)
+        return cex_of_tchecker_output(output, a.events)
+
+class NativeOracle(EmptinessOracle):
+    ''' explores the zone graph of a * b in-process (see zonegraph.py)
+    '''
+    name = 'zonegraph'
+
+    def search(self, a: era.ERA, b: era.ERA, metrics: stats.LearnerMetrics) -> symbolicword.SymWord:
+        with metrics.timed('zonegraph'):
+            return zonegraph.find_accepting_path(a, b)
+
+class CachedOracle(EmptinessOracle):
+    ''' answers the queries of another oracle, remembering the answer 
+        for every pair of automata (compared by their states and transitions)
+    '''
+    def __init__(self, oracle: EmptinessOracle) -> None:
+        super().__init__()
+        self.oracle = oracle
+        self.name = f'cached {oracle.name}'
+        self.answers = {}
+        self.hits = 0
+
+    def search(self, a: era.ERA, b: era.ERA, metrics: stats.LearnerMetrics) -> symbolicword.SymWord:
+        key = (fingerprint(a), fingerprint(b))
+        if key in self.answers:
+            self.hits += 1
+        else:
+            self.answers[key] = self.oracle.find_accepting_path(a, b, metrics)
+        return self.answers[key]
+
+    def report(self) -> str:
+        return f'{super().report()} ({self.hits} hits); {self.oracle.report()}'
+
+class ReplayOracle(EmptinessOracle):
+    ''' answers the queries recorded in a query log (see querylog.py), 
+        and asks another oracle the queries that are not in the log
+        (recording their answers)
+    '''
+    def __init__(self, oracle: EmptinessOracle, log: querylog.QueryLog) -> None:
+        super().__init__()
+        self.oracle = oracle
+        self.log = log
+        self.name = f'replayed {oracle.name}'
+        self.hits = 0
+
+    def search(self, a: era.ERA, b: era.ERA, metrics: stats.LearnerMetrics) -> symbolicword.SymWord:
+        key = querylog.digest((fingerprint(a), fingerprint(b)))
+        found, cex = self.log.find_inclusion(key)
+        if found:
+            self.hits += 1
+            return cex
+        cex = self.oracle.find_accepting_path(a, b, metrics)
+        self.log.record_inclusion(key, cex)
+        return cex
+
+    def report(self) -> str:
+        return f'{super().report()} ({self.hits} replayed); {self.oracle.report()}'
+
+def fingerprint(a: era.ERA) -> tuple:
+    ''' a hashable description of a: two ERAs with the same fingerprint
+        have the same states, events and transitions
+    '''
+    states = tuple((q.init, a.is_final(i)) for i, q in a.states.items())
+    transitions = tuple(sorted((src_index, t.tgt.index(), t.event.name, t.guard.expr)
+                               for src_index in range(a.nstates)
+                               for t in a.transitions.from_state(src_index)))
+    return (tuple(e.name for e in a.events), tuple(e.name for e in a.active_clocks),
+            states, transitions)
+
+oracles = {'tchecker': TCheckerProductOracle,
+           'tchecker-network': TCheckerNetworkOracle,
+           'zonegraph': NativeOracle}
+
+def make_oracle(name: str, cached: bool = False, **kwargs) -> EmptinessOracle:
+    ''' return a new oracle of the given name (a key of oracles),
+        kwargs are passed to its constructor
+    '''
+    oracle = oracles[name](**kwargs)
+    return CachedOracle(oracle) if cached else oracle
+
+def open_query_log(path: str, sul: era.ERA, m: int, 
+                   oracle: EmptinessOracle = None) -> tuple:
+    ''' open (or create) the query log of sul and m in path
+
+        returns:
+            (log, replay oracle) - the log, to be given to run_tLsep, and 
+                                   oracle (emptiness_oracle if None) 
+                                   answering from the log first
+    '''
+    log = querylog.QueryLog(path, querylog.digest(fingerprint(sul)), m)
+    return (log, ReplayOracle(oracle or emptiness_oracle, log))
+
+# the oracle used by inclusion queries, unless another one is given
+emptiness_oracle = TCheckerProductOracle()
+
+# maximum number of maximal compatible sets enumerated by compute_minimal_dera
+# (None: all of them, 0: a greedy cover only)
+compatible_sets_limit = None
+
+def check_inclusion(a1: era.ERA, a2: era.ERA, 
+                    oracle: EmptinessOracle = None,
+                    metrics: stats.LearnerMetrics = None) -> symbolicword.SymWord:
+    metrics = metrics or stats.metrics
+    metrics.count('IQ')
+
+    a2_c = era.ComplementView(a2)
+    oracle = oracle or emptiness_oracle
+    with metrics.timed('inclusion'):
+        return oracle.find_accepting_path(a1, a2_c, metrics)
+
+def is_equal(a: era.ERA, b: era.ERA, oracle: EmptinessOracle = None,
+             metrics: stats.LearnerMetrics = None) -> bool:
+    if ((check_inclusion(a,b,oracle,metrics) == None) and (check_inclusion(b,a,oracle,metrics) == None)):
         return True
     return False
 
-def check_completeness(automaton: era.ERA, sul: era.ERA):
-    cex = check_inclusion(automaton, sul)
+def check_completeness(automaton: era.ERA, sul: era.ERA, oracle: EmptinessOracle = None,
+                       metrics: stats.LearnerMetrics = None):
+    cex = check_inclusion(automaton, sul, oracle, metrics)
     if cex is not None:
         return (cex, False)
     
-    automaton_rej = deepcopy(automaton)
-    automaton_rej.make_dc_states_accepting()
-    cex = check_inclusion(sul, automaton_rej)
+    automaton_rej = era.DontCareAcceptingView(automaton)
+    cex = check_inclusion(sul, automaton_rej, oracle, metrics)
     if cex is not None:
         return (cex, True)
 
     return (None, True)
 
-def find_set_max_card(s: set):
-    ''' argument: set of sets
-        return: the set with max cardinality
-        if there are more than one, choose non-deterministically
+def find_set_max_card(sets: list, candidates: int) -> int:
+    ''' arguments: 
+            sets       : list of bitsets
+            candidates : bitset of indices in sets
+        return: the index of the candidate set with max cardinality
+        if there are more than one, choose the first one
     '''
-    index = 0
-    
-    # find the set with max length
-    for i in range(1,len(s)):
-        if (len(s[i]) > len(s[index])):
+    index = None
+    for i in era.bits(candidates):
+        if index is None or bin(sets[i]).count('1') > bin(sets[index]).count('1'):
             index = i
-    return s[index]
+    return index
 
-def invert_dict(d):
-    return {v: k for k, v in d.items()}
+def compute_minimal_dera(a: era.ERA, limit: int = None):
+    ''' compute a DERA consistent with the 3ERA a, whose states are 
+        maximal compatible sets of states of a
 
-def compute_minimal_dera(a: era.ERA):
-    max_compatible_sets = a.find_maximal_compatible_sets()
-    max_init_sets = [s for s in max_compatible_sets if 0 in s]
-    init_state = find_set_max_card(max_init_sets)   # the first element among max sets containing 0
-  
-    #set of accepting states
-    accepting_sets = [s for s in max_compatible_sets if any(a.states[i].accepting for i in s)]
+        arguments:
+            a     : a 3ERA
+            limit : maximum number of maximal compatible sets enumerated
+                    upfront (all of them if None), the sets needed later 
+                    are built greedily (see era.find_maximal_compatible_sets)
+    '''
+    compatible = a.compatibility_graph()
+    
+    # the maximal compatible sets, as bitsets of states of a, 
+    # and sets_with[q] is the bitset of indices of the sets containing q
+    max_compatible_sets = []
+    sets_with = [0] * len(a.states)
+    def add_set(bitset: int) -> int:
+        index = len(max_compatible_sets)
+        max_compatible_sets.append(bitset)
+        for q in era.bits(bitset):
+            sets_with[q] |= 1 << index
+        return index
+    for s in a.find_maximal_compatible_sets(limit, compatible):
+        add_set(sum(1 << q for q in s))
+
+    def find_containing_set(bitset: int) -> int:
+        ''' the index of the first largest set containing bitset '''
+        candidates = (1 << len(max_compatible_sets)) - 1
+        for q in era.bits(bitset):
+            candidates &= sets_with[q]
+        if candidates == 0:
+            # only with a limit: extend the set to a new maximal set
+            return add_set(sum(1 << q for q in 
+                               a.extend_to_maximal_compatible_set(set(era.bits(bitset)), compatible)))
+        return find_set_max_card(max_compatible_sets, candidates)
+
+    # the letters of a, with the successors of every state as a bitset:
+    # successors[letter] = {src: bitset of targets}
+    letters = dict()
+    for src in range(a.nstates):
+        for t in a.transitions.from_state(src):
+            letters.setdefault((t.event.name, t.guard.expr), (t.event, t.guard))
+    successors = {letter: {src: sum(1 << tgt for tgt in set(targets)) for src, targets in sources.items()}
+                  for letter, sources in a.transitions_on_letters_from_state.items()}
+    accepting = sum(1 << q for q in range(len(a.states)) if a.is_final(q))
 
     new_era = era.ERA(0)
     new_era.events = a.events[:]
     new_era.active_clocks = a.active_clocks[:]
 
-    # create a dict: states_dict[index of state] = index of the corr. set in max_compatible_sets
+    # states_dict[index of state] = index of the corr. set in max_compatible_sets,
+    # and state_of_set is the reverse map
     states_dict = dict()
-    # find index of init_state
+    state_of_set = dict()
+    
+    # the initial state is the first largest set containing 0
     q_in = new_era.add_state()
     new_era.make_initial(q_in.index())
-    states_dict[q_in.index()] = max_compatible_sets.index(init_state)
-
-    # for a forward analysis, keep a stack of state indices
-    stack = []
-    stack.append(q_in.index())
-
-    # pop the first element from the stack and create a new state
-    while len(stack) != 0:
-        current_index = stack.pop(0)
+    init_index = find_containing_set(1)
+    states_dict[q_in.index()] = init_index
+    state_of_set[init_index] = q_in.index()
+
+    # forward analysis, breadth-first
+    queue = deque([q_in.index()])
+    while len(queue) != 0:
+        current_index = queue.popleft()
         current_state = new_era.states[current_index]
+        current_set = max_compatible_sets[states_dict[current_index]]
 
         # check if the new state is accepting
-        if max_compatible_sets[states_dict[current_index]] in accepting_sets:
+        if current_set & accepting:
             new_era.make_final(current_index)
 
         # add transitions from the new state
-        for letter in a.transitions_on_letters_from_state.keys():
-            e = event.Event(letter[0])
-            g = expression.typecheck(letter[1])
-
-            out_set_on_letter_from_i = set()
-
-            for index in max_compatible_sets[states_dict[current_index]]:
-                if index in a.transitions_on_letters_from_state[letter].keys():
-                    out_set_on_letter_from_i.update(a.transitions_on_letters_from_state[letter][index])
-            
-            # out_set_on_letter_from_i is the basically delta(current_max_set, (e,g))
-            if len(out_set_on_letter_from_i)!=0:
-                
-                # find the maximal set that contains out_set_on_letter_from_i : there exists at least one
-                out_maximal_sets = [s for s in max_compatible_sets if out_set_on_letter_from_i.issubset(s)]
-                next_set = find_set_max_card(out_maximal_sets)
-
-                # find corresponding state for next_set
-                next_set_index = max_compatible_sets.index(next_set)
-                inverted_states_dict = invert_dict(states_dict)
-                out_index = inverted_states_dict.get(next_set_index)
-
-                if out_index is None:   # i.e., no corresponding state yet, so create new and add it to the stack
-                    q_new = new_era.add_state()
-                    states_dict[q_new.index()] = next_set_index
-                    stack.append(q_new.index())
-                    out_index = q_new.index()
+        for letter, successors_on_letter in successors.items():
+            # out_set_on_letter is basically delta(current_max_set, (e,g))
+            out_set_on_letter = 0
+            for index in era.bits(current_set):
+                out_set_on_letter |= successors_on_letter.get(index, 0)
+            if out_set_on_letter == 0:
+                continue
                 
+            # find the maximal set that contains out_set_on_letter : there exists at least one
+            next_set_index = find_containing_set(out_set_on_letter)
+            out_index = state_of_set.get(next_set_index)
+
+            if out_index is None:   # i.e., no corresponding state yet, so create new and add it to the queue
+                q_new = new_era.add_state()
+                states_dict[q_new.index()] = next_set_index
+                state_of_set[next_set_index] = q_new.index()
+                queue.append(q_new.index())
+                out_index = q_new.index()
 
-                # finally, add the transition
-                tgt_state = new_era.states[out_index]
-                new_era.nd_add_transition(current_state, e, g, tgt_state)
+            # finally, add the transition
+            e, g = letters[letter]
+            new_era.nd_add_transition(current_state, e, g, new_era.states[out_index])
 
     return new_era
     
-def run_tLsep(sul: era.ERA, m: int) -> era.ERA:
+def run_tLsep(sul: era.ERA, m: int, oracle: EmptinessOracle = None,
+              metrics: stats.LearnerMetrics = None, log: querylog.QueryLog = None) -> era.ERA:
     ''' this function implements the algorithm tLsep
         
         arguments:
             sul      : an ERA that is to be learnt
             m        : maximum constant present in the guards
+            oracle   : the oracle answering inclusion queries 
+                       (emptiness_oracle if None)
+            metrics  : where the counters and the timers of the run are 
+                       recorded (stats.metrics if None)
+            log      : the log answering (and recording) membership queries,
+                       see open_query_log
 
         returns:
             an ERA having the same language as sul
     '''
-    observation_table = observationTable.ObservationTable(sul, m)
+    metrics = metrics or stats.metrics
+    with metrics.timed('table'):
+        observation_table = observationTable.ObservationTable(sul, m, metrics, log)
+
+    # the workers answering membership queries (if any) are stopped
+    # however the run ends, e.g. on KeyboardInterrupt
+    try:
+        # inclusion queries only read sul, they do not need a copy of it
+        sul_c = sul
+
+        with metrics.timed('table'):
+            observation_table.add_S_dot_sigma()
 
-    sul_c = deepcopy(sul)
-   
-    observation_table.add_S_dot_sigma()
-    
-    while True:
         while True:
-            stats.EQ+=1
-            observation_table.make_close_and_consistent()
+            while True:
+                metrics.count('EQ')
+                with metrics.timed('table'):
+                    observation_table.make_close_and_consistent()
 
-            candidate_automaton, states_dict = observation_table.generate_3era()
+                with metrics.timed('hypothesis'):
+                    candidate_automaton, states_dict = observation_table.generate_3era()
 
-            # completeness check
-            cex, accepted_by_sul = check_completeness(candidate_automaton, sul_c)
-            if cex is None:
-                break
+                # completeness check
+                with metrics.timed('completeness'):
+                    cex, accepted_by_sul = check_completeness(candidate_automaton, sul_c, oracle, metrics)
+                if cex is None:
+                    break
 
-            observation_table.add_cex(cex, candidate_automaton, accepted_by_sul, states_dict, add_all_prefixes=False)
+                with metrics.timed('counterexample'):
+                    observation_table.add_cex(cex, candidate_automaton, accepted_by_sul, states_dict, add_all_prefixes=False)
 
-        stats.EQ+=1
+            metrics.count('EQ')
 
-        minimal_consistent_dera = compute_minimal_dera(candidate_automaton)
-        
-        # soundness check
-        cex = check_inclusion(sul_c, minimal_consistent_dera)
-        if cex is not None:
-            accepted_by_sul = True
+            with metrics.timed('minimization'):
+                minimal_consistent_dera = compute_minimal_dera(candidate_automaton, compatible_sets_limit)
 
-        if cex is None:
-            cex = check_inclusion(minimal_consistent_dera, sul_c)
+            # soundness check
+            with metrics.timed('soundness'):
+                cex = check_inclusion(sul_c, minimal_consistent_dera, oracle, metrics)
             if cex is not None:
-                accepted_by_sul = False
+                accepted_by_sul = True
 
             if cex is None:
-                minimal_consistent_dera.remove_sinks()
-                return minimal_consistent_dera
-
+                with metrics.timed('soundness'):
+                    cex = check_inclusion(minimal_consistent_dera, sul_c, oracle, metrics)
+                if cex is not None:
+                    accepted_by_sul = False
 
-        observation_table.add_cex(cex, candidate_automaton, accepted_by_sul, states_dict, add_all_prefixes=True)
+                if cex is None:
+                    minimal_consistent_dera.remove_sinks()
+                    return minimal_consistent_dera
 
+            with metrics.timed('counterexample'):
+                observation_table.add_cex(cex, candidate_automaton, accepted_by_sul, states_dict, add_all_prefixes=True)
+    finally:
+        observation_table.close()
 
 
 if __name__ == '__main__':
@@ -347,24 +584,115 @@ if __name__ == '__main__':
     argparser.add_argument('--m', dest='m', type=int,
                                   help="maximum constant appearing in guards", 
                                   required=True, metavar="<int>")
+    argparser.add_argument('--guards', dest='guards', type=str,
+                                       choices=['native', 'z3', 'check'], default='native',
+                                       help="procedure for guard intersection and containment: "
+                                            "interval arithmetic (native), Z3, or both cross-checked (check)")
+    argparser.add_argument('--word-emptiness', dest='word_emptiness', type=str,
+                                               choices=['dbm', 'z3', 'check'], default='dbm',
+                                               help="procedure for emptiness of symbolic words: "
+                                                    "DBMs (dbm), Z3, or both cross-checked (check)")
+    argparser.add_argument('--acceptance', dest='acceptance', type=str,
+                                           choices=['simulation', 'z3', 'check'], default='simulation',
+                                           help="procedure deciding if the sul accepts a symbolic word: "
+                                                "simulation of the sul, Z3, or both cross-checked (check)")
+    argparser.add_argument('--inclusion', dest='inclusion', type=str,
+                                          choices=list(oracles.keys()), default='tchecker',
+                                          help="procedure for inclusion queries: TChecker on the product automaton (tchecker), "
+                                               "TChecker on the network of the two automata (tchecker-network), "
+                                               "or an in-process zone graph exploration (zonegraph)")
+    argparser.add_argument('--cache-inclusion', dest='cache_inclusion', action='store_true',
+                                                help="remember the answers of inclusion queries")
+    argparser.add_argument('--tchecker', dest='tchecker', type=str, default=None,
+                                         help="path to tck-reach (overrides config.py)", metavar="<str>")
+    argparser.add_argument('--tchecker-algorithm', dest='tchecker_algorithm', type=str, default='covreach',
+                                                   help="reachability algorithm of tck-reach (option -a)", metavar="<str>")
+    argparser.add_argument('--tchecker-certificate', dest='tchecker_certificate', type=str, default='concrete',
+                                                     help="certificate returned by tck-reach (option -C)", metavar="<str>")
+    argparser.add_argument('--max-compatible-sets', dest='max_compatible_sets', type=int, default=None,
+                                                    help="maximum number of maximal compatible sets enumerated "
+                                                         "when computing a DERA from a 3ERA (default: all, 0: greedy)",
+                                                    metavar="<int>")
+    argparser.add_argument('--workers', dest='workers', type=int, default=1,
+                                        help="number of processes answering large batches "
+                                             "of membership queries", metavar="<int>")
+    argparser.add_argument('--metrics', dest='metrics', type=str, default=None,
+                                        help="file where the counters and timers of the run are written (JSON), "
+                                             "they are also printed at the end of the run",
+                                        metavar="<str>")
+    argparser.add_argument('--live-summary', dest='live_summary', type=float, default=None,
+                                             help="print the counters and timers on stderr every given "
+                                                  "number of seconds", metavar="<float>")
+    argparser.add_argument('--profile', dest='profile', type=str, default=None,
+                                        help="profile the run, and write the profile to files "
+                                             "starting with the given prefix (see profiling.py)", metavar="<str>")
+    argparser.add_argument('--profile-mode', dest='profile_mode', type=str,
+                                             choices=['deterministic', 'sampling'], default='deterministic',
+                                             help="measure every call with cProfile (deterministic), "
+                                                  "or sample the stack periodically (sampling)")
+    argparser.add_argument('--profile-interval', dest='profile_interval', type=float, default=0.005,
+                                                 help="sampling interval, in seconds", metavar="<float>")
+    argparser.add_argument('--profile-top', dest='profile_top', type=int, default=5,
+                                            help="number of functions shown for every subsystem", metavar="<int>")
+    argparser.add_argument('--query-log', dest='query_log', type=str, default=None,
+                                          help="file recording the queries to the sul and their answers; "
+                                               "the queries already in the file are answered from it",
+                                          metavar="<str>")
     args = argparser.parse_args()
 
     m = args.m
+    helper.guard_backend = args.guards
+    acceptance.emptiness_backend = args.word_emptiness
+    acceptance.acceptance_backend = args.acceptance
+    mqpool.workers = args.workers
+    compatible_sets_limit = args.max_compatible_sets
+    if args.inclusion == 'zonegraph':
+        oracle = make_oracle(args.inclusion, args.cache_inclusion)
+    else:
+        oracle = make_oracle(args.inclusion, args.cache_inclusion, tchecker=args.tchecker, 
+                             algorithm=args.tchecker_algorithm, certificate=args.tchecker_certificate)
     
+    metrics = stats.LearnerMetrics(live=args.live_summary)
     start = time.time()
 
     # read the sul from file
     sul = parse.build_era_from_file(args.sul)
 
     # run tLsep
-    automaton = run_tLsep(sul, m)
+    log = None
+    if args.query_log:
+        log, oracle = open_query_log(args.query_log, sul, m, oracle)
+
+    profiler = profiling.make_profiler(args.profile_mode, args.profile_interval) if args.profile else None
+    if profiler:
+        profiler.start()
+    try:
+        automaton = run_tLsep(sul, m, oracle, metrics, log)
+    finally:
+        # keep the answers already paid for, even if the run is interrupted
+        if log:
+            log.close()
+    if profiler:
+        profiler.stop()
 
     print(automaton)
 
     print(f'total time taken: {time.time() - start}')
-    print(f'# membership queries {stats.MQ}')
-    print(f'# membership queries with cache {stats.MQc}')
-    print(f'# inclusion queries {stats.IQ}')
-    print(f'# equivalence queries {stats.EQ}')
-    print(f'# times all_prefixes were added {stats.all_prefixes}')
-    print(f'# times Rivest-Schapire was used {stats.rs_calls}')
\ No newline at end of file
+    print(f'# membership queries {metrics["MQ"]}')
+    print(f'# membership queries with cache {metrics["MQc"]}')
+    print(f'# inclusion queries {metrics["IQ"]}')
+    print(f'# time spent in inclusion queries ({oracle.report()})')
+    print(f'# equivalence queries {metrics["EQ"]}')
+    print(f'# times all_prefixes were added {metrics["all_prefixes"]}')
+    print(f'# times Rivest-Schapire was used {metrics["rs_calls"]}')
+    if args.metrics or args.live_summary is not None:
+        print(metrics.summary())
+    if args.metrics:
+        metrics.dump(args.metrics)
+    if log:
+        print(f'# query log {log.report()}')
+    if profiler:
+        print(profiler.report(args.profile_top))
+        print(f'# profile written to {", ".join(profiler.write(args.profile))}')
+    for session in z3session.sessions.values():
+        print(f'# Z3 session {session.report()}')
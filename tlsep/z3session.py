@@ -0,0 +1,118 @@
+''' this file implements incremental Z3 sessions
+
+    the Z3 queries of acceptance.py and helper.py are conjunctions of
+    frames, where a frame only depends on the frames before it
+    (e.g. the constraints on the time stamp of the i-th event of a word
+    only depend on the first i events). a session keeps one solver with the
+    frames of the last query asserted in nested scopes (one push() per frame),
+    so that a query only pops the frames that differ from the last query
+    and pushes its own, instead of building a new solver from scratch.
+
+    the Real and Bool variables are created once per name and session.
+'''
+
+from z3 import Solver, Real, Bool, sat
+
+class Session:
+    ''' a solver with a stack of frames
+
+    attributes --
+    solver  : the Z3 solver, with one scope per frame of the stack
+    stack   : keys of the frames currently asserted in the solver
+    vars    : dict {name: Z3 variable}
+    queries : no. of queries
+    hits    : no. of queries that reused at least one frame
+    reused  : no. of frames reused from the previous query
+    pushed  : no. of frames pushed
+    created : no. of variables created
+    '''
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.solver = Solver()
+        self.stack = []
+        self.vars = {}
+        self.queries = 0
+        self.hits = 0
+        self.reused = 0
+        self.pushed = 0
+        self.created = 0
+
+    def real(self, name: str):
+        return self._var(name, Real)
+
+    def bool(self, name: str):
+        return self._var(name, Bool)
+
+    def _var(self, name: str, sort):
+        v = self.vars.get(name)
+        if v is None:
+            v = sort(name)
+            self.vars[name] = v
+            self.created += 1
+        return v
+
+    def reset(self) -> None:
+        ''' pop every frame (variables are kept)
+        '''
+        self.solver.reset()
+        self.stack = []
+
+    def sync(self, keys: list, frame) -> None:
+        ''' make the stack equal to keys
+
+            arguments:
+                keys  : keys of the frames, compared with ==
+                frame : function such that frame(i) returns the list
+                        of constraints of the frame keys[i]
+        '''
+        k = 0
+        while k < len(self.stack) and k < len(keys) and self.stack[k] == keys[k]:
+            k += 1
+        if len(self.stack) > k:
+            self.solver.pop(len(self.stack) - k)
+            del self.stack[k:]
+        self.reused += k
+        if k > 0:
+            self.hits += 1
+        for i in range(k, len(keys)):
+            self.solver.push()
+            self.solver.add(frame(i))
+            self.stack.append(keys[i])
+            self.pushed += 1
+
+    def is_sat(self, keys: list, frame, query: list = None) -> bool:
+        ''' return True  if the conjunction of the frames keys
+                         and of the constraints in query is satisfiable
+                   False otherwise
+
+            (query is asserted in a scope of its own, popped before returning)
+        '''
+        self.queries += 1
+        self.sync(keys, frame)
+        if not query:
+            return self.solver.check() == sat
+        self.solver.push()
+        try:
+            self.solver.add(query)
+            return self.solver.check() == sat
+        finally:
+            self.solver.pop()
+
+    def report(self) -> str:
+        return (f'{self.name}: {self.queries} queries, {self.hits} hits, '
+                f'{self.reused} frames reused, {self.pushed} frames pushed, '
+                f'{self.created} variables')
+
+sessions = {}
+
+def session(name: str) -> Session:
+    ''' return the session called name, created on the first call
+    '''
+    s = sessions.get(name)
+    if s is None:
+        s = Session(name)
+        sessions[name] = s
+    return s
+
+def report() -> str:
+    return '\n'.join(s.report() for s in sessions.values())
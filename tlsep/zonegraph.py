@@ -0,0 +1,102 @@
+''' this file implements the emptiness check of the product of two ERAs
+    on its zone graph, without calling TChecker
+
+    the nodes of the zone graph of a x b are (q1, q2, Z), where Z is the
+    (extrapolated) zone of clock valuations reached at the pair (q1, q2),
+    with time elapsed. the graph is explored in breadth-first order and
+    a node is dropped when its zone is included in the zone of a node
+    already visited at the same pair of states (covering reachability),
+    exactly as tck-reach -a covreach does on the product automaton
+'''
+
+from collections import deque
+
+import dbm
+import era
+import expression
+import guards
+import symbolicword
+
+def max_constants(automata: list) -> dict:
+    ''' return a dict {clock: largest constant the clock is compared with}
+        over the guards of all the automata
+    '''
+    constants = {}
+    for a in automata:
+        for src_index in range(a.nstates):
+            for t in a.transitions.from_state(src_index):
+                for clk, interval in guards.canonicalize(t.guard).items():
+                    c = interval.lower if interval.upper is None else max(interval.lower, interval.upper)
+                    constants[clk] = max(constants.get(clk, 0), c)
+    return constants
+
+def find_accepting_path(a: era.ERA, b: era.ERA) -> symbolicword.SymWord:
+    ''' check if some word is accepted by both a and b
+
+        arguments:
+            a, b    : two ERAs over the same events
+        
+        returns:
+            None    - if the product of a and b is empty
+            a symbolic word accepted by a and b (its guards are
+            the conjunctions of the guards of the product transitions),
+            EPSILON if the initial states of a and b are both accepting
+    '''
+    assert a.events == b.events
+    clocks = [e.name for e in a.active_clocks]
+    constants = max_constants([a, b])
+
+    zone = dbm.DBM.initial(clocks)
+    zone.elapse()
+    start = (a.initialstate.index(), b.initialstate.index())
+
+    # nodes[k] = (pair of states, zone, parent node, pair of transitions from the parent)
+    nodes = [(start, zone, None, None)]
+    passed = {start: [zone]}
+    waiting = deque([0])
+    while waiting:
+        k = waiting.popleft()
+        (q1, q2), zone, _, _ = nodes[k]
+        if a.is_final(q1) and b.is_final(q2):
+            return path_to(nodes, k)
+
+        for t1 in a.transitions.from_state(q1):
+            for t2 in b.transitions.on_event(q2, t1.event.name):
+                # the guards constrain the zone one after the other, the pair
+                # is dropped as soon as the zone is empty, and the conjunction
+                # of the guards is built only for the counterexample (path_to)
+                succ = zone.copy()
+                succ.constrain_guard(t1.guard)
+                if succ.is_empty():
+                    continue
+                succ.constrain_guard(t2.guard)
+                if succ.is_empty():
+                    continue
+                succ.reset(t1.event.name)
+                succ.elapse()
+                succ.extrapolate(constants)
+
+                pair = (t1.tgt.index(), t2.tgt.index())
+                visited = passed.setdefault(pair, [])
+                if any(z.includes(succ) for z in visited):
+                    continue
+                visited.append(succ)
+                nodes.append((pair, succ, k, (t1, t2)))
+                waiting.append(len(nodes) - 1)
+    return None
+
+def path_to(nodes: list, k: int) -> symbolicword.SymWord:
+    ''' return the symbolic word labelling the path from the root to nodes[k]
+    '''
+    path = []
+    while nodes[k][2] is not None:
+        t1, t2 = nodes[k][3]
+        if t1.guard == t2.guard:
+            g = t1.guard
+        else:
+            g = expression.ConjExpression((t1.guard, t2.guard))
+        path.append(symbolicword.SymEvent.constructUsingEventGuard(t1.event, g))
+        k = nodes[k][2]
+    if len(path) == 0:
+        return symbolicword.SymWord([symbolicword.SymEvent('EPSILON')])
+    return symbolicword.SymWord(path[::-1])